@@ -32,6 +32,20 @@ class CustomerService:
         Used for uploaded invoices to decide between existing vs new customers.
         Returns the matching Customer if found, otherwise None.
         """
+        vehicle = CustomerService.find_vehicle_by_name_and_plate(branch, full_name, plate_number)
+        return vehicle.customer if vehicle else None
+
+    @staticmethod
+    def find_vehicle_by_name_and_plate(
+        branch: Optional[Branch],
+        full_name: str,
+        plate_number: str,
+    ) -> Optional[Vehicle]:
+        """
+        Find the vehicle matching a composite identifier (customer name + plate number) within a branch.
+        The owning customer is fetched in the same query, so callers needing both avoid a second lookup.
+        Returns the matching Vehicle if found, otherwise None.
+        """
         try:
             if not branch or not full_name or not plate_number:
                 return None
@@ -49,9 +63,9 @@ class CustomerService:
                 )
                 .first()
             )
-            return vehicle.customer if vehicle else None
+            return vehicle
         except Exception as e:
-            logger.warning(f"Error finding customer by name+plate: {e}")
+            logger.warning(f"Error finding vehicle by name+plate: {e}")
             return None
 
     @staticmethod
@@ -0,0 +1,287 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase
+
+from tracker.utils import invoice_extractor
+from tracker.utils.invoice_extractor import extract_from_bytes, iter_pdf_page_texts, ocr_image
+
+
+def make_pdf(*page_texts):
+    """Build an in-memory PDF with one page per text.
+
+    An empty text gives a blank, image-only style page; each blank page is a
+    little wider than the last so a fake OCR can tell them apart.
+    """
+    doc = invoice_extractor.fitz.open()
+    for number, text in enumerate(page_texts):
+        page = doc.new_page(width=300 + number * 10, height=300)
+        if text:
+            page.insert_text((20, 50), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class FakeTessBaseAPI:
+    """Stand-in for tesserocr.PyTessBaseAPI that blocks until ``release`` is set."""
+
+    release = None
+
+    def __init__(self, **kwargs):
+        pass
+
+    def SetImage(self, img):
+        self.img = img
+
+    def GetUTF8Text(self):
+        self.release.wait(5)
+        return 'recognised text'
+
+
+@skipUnless(invoice_extractor.cv2 is not None, 'OpenCV is not installed')
+class OcrImageTesserocrTests(SimpleTestCase):
+    def setUp(self):
+        # Fresh pool so no thread keeps a tesserocr API from another test
+        invoice_extractor._reset_ocr_pool()
+        self.release = threading.Event()
+        FakeTessBaseAPI.release = self.release
+        fake_tesserocr = SimpleNamespace(PyTessBaseAPI=FakeTessBaseAPI, PSM=SimpleNamespace(SINGLE_BLOCK=6))
+        patcher = mock.patch.object(invoice_extractor, 'tesserocr', fake_tesserocr)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.release.set()
+        invoice_extractor._ocr_pool().shutdown(wait=True)
+        invoice_extractor._reset_ocr_pool()
+
+    def test_returns_recognised_text(self):
+        self.release.set()
+        img = invoice_extractor.Image.new('L', (10, 10))
+        self.assertEqual(ocr_image(img), 'recognised text')
+
+    def test_slow_recognition_times_out(self):
+        img = invoice_extractor.Image.new('L', (10, 10))
+        with mock.patch.object(invoice_extractor, 'OCR_TIMEOUT_SECONDS', 0.1):
+            with self.assertRaisesRegex(RuntimeError, 'timed out'):
+                ocr_image(img)
+
+    def test_falls_back_to_pytesseract_when_tesserocr_cannot_initialise(self):
+        img = invoice_extractor.Image.new('L', (10, 10))
+        fake_pytesseract = mock.Mock()
+        fake_pytesseract.image_to_string.return_value = 'pytesseract text'
+        with mock.patch.object(FakeTessBaseAPI, '__init__', side_effect=RuntimeError('no eng.traineddata')), \
+                mock.patch.object(invoice_extractor, 'pytesseract', fake_pytesseract):
+            self.assertEqual(ocr_image(img), 'pytesseract text')
+        fake_pytesseract.image_to_string.assert_called_once()
+
+
+class OcrJobTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.pool.shutdown, wait=True)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        for patcher in (
+            mock.patch.object(invoice_extractor, '_ocr_pool', return_value=self.pool),
+            mock.patch.object(invoice_extractor, '_recognize', side_effect=self.recognize),
+            mock.patch.object(invoice_extractor, 'OCR_TIMEOUT_SECONDS', 0.5),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def recognize(self, img):
+        if img == 'slow':
+            time.sleep(0.35)
+        elif img == 'stuck':
+            self.release.wait(5)
+        elif img == 'broken':
+            raise ValueError('bad page')
+        return f'text of {img}'
+
+    def test_deadline_runs_from_when_the_job_starts(self):
+        # The last job waits ~0.7s in the queue, longer than the limit, but runs instantly
+        invoice_extractor._OcrJob('slow')
+        invoice_extractor._OcrJob('slow')
+        self.assertEqual(invoice_extractor._OcrJob('fast').result(), 'text of fast')
+
+    def test_stuck_job_times_out(self):
+        with self.assertRaisesRegex(RuntimeError, 'timed out'):
+            invoice_extractor._OcrJob('stuck').result()
+
+    def test_failure_is_reported_as_runtime_error(self):
+        with self.assertRaisesRegex(RuntimeError, 'bad page'):
+            invoice_extractor._OcrJob('broken').result()
+
+
+@skipUnless(invoice_extractor.fitz is not None, 'PyMuPDF is not installed')
+class ExtractFromBytesWithoutOcrTests(SimpleTestCase):
+    def setUp(self):
+        invoice_extractor._RESULT_CACHE.clear()
+        invoice_extractor._OCR_TEXT_CACHE.clear()
+        patcher = mock.patch.object(invoice_extractor, 'OCR_AVAILABLE', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_scanned_pdf_reports_ocr_unavailable(self):
+        result = extract_from_bytes(make_pdf(''))
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], 'ocr_unavailable')
+
+
+@skipUnless(invoice_extractor.fitz is not None, 'PyMuPDF is not installed')
+class ExtractFromBytesCacheTests(SimpleTestCase):
+    def setUp(self):
+        invoice_extractor._RESULT_CACHE.clear()
+        invoice_extractor._OCR_TEXT_CACHE.clear()
+
+    def test_cache_hit_returns_independent_copy(self):
+        data = make_pdf('Customer Name: Jane Doe Trading Ltd\nReference: Fleet service')
+        first = extract_from_bytes(data)
+        self.assertTrue(first['success'])
+        first['header']['customer_name'] = 'Changed'
+        first['items'].append({'description': 'Injected'})
+
+        second = extract_from_bytes(data)
+        self.assertEqual(second['header']['customer_name'], 'Jane Doe Trading Ltd')
+        self.assertEqual(second['items'], [])
+
+    def test_cache_hit_skips_extraction(self):
+        data = make_pdf('Customer Name: Jane Doe Trading Ltd\nReference: Fleet service')
+        extract_from_bytes(data)
+        with mock.patch.object(invoice_extractor, 'ocr_pdf_bytes') as ocr_pdf_bytes:
+            extract_from_bytes(data)
+        ocr_pdf_bytes.assert_not_called()
+
+    def test_different_files_do_not_collide(self):
+        first = extract_from_bytes(make_pdf('Customer Name: Jane Doe Trading Ltd\nReference: A'))
+        second = extract_from_bytes(make_pdf('Customer Name: John Roe Motors Ltd\nReference: B'))
+        self.assertEqual(first['header']['customer_name'], 'Jane Doe Trading Ltd')
+        self.assertEqual(second['header']['customer_name'], 'John Roe Motors Ltd')
+        self.assertEqual(len(invoice_extractor._RESULT_CACHE), 2)
+
+
+class InlineOcrPool:
+    """Executor stand-in that runs each OCR job on submit and records how many were submitted."""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def fake_recognize(gray):
+    return f'OCR page width {gray.shape[1]}'
+
+
+def ocr_width(page_text):
+    return int(page_text.rsplit(' ', 1)[1]) if page_text.startswith('OCR page width') else None
+
+
+@skipUnless(invoice_extractor.fitz is not None and invoice_extractor.np is not None, 'PyMuPDF/numpy not installed')
+class IterPdfPageTextsTests(SimpleTestCase):
+    def setUp(self):
+        invoice_extractor._RESULT_CACHE.clear()
+        invoice_extractor._OCR_TEXT_CACHE.clear()
+        self.pool = InlineOcrPool()
+        for patcher in (
+            mock.patch.object(invoice_extractor, 'OCR_AVAILABLE', True),
+            mock.patch.object(invoice_extractor, '_ocr_pool', return_value=self.pool),
+            mock.patch.object(invoice_extractor, '_recognize', side_effect=fake_recognize),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_text_pages_are_not_ocrd(self):
+        texts = [f'Text layer page {i} with plenty of characters' for i in range(3)]
+        pages = list(iter_pdf_page_texts(make_pdf(*texts)))
+        self.assertEqual([page.strip() for page in pages], texts)
+        self.assertEqual(self.pool.submitted, 0)
+
+    def test_image_only_pages_fall_back_to_ocr_in_order(self):
+        texts = ['Text layer page 0 with plenty of characters', '', 'Text layer page 2 with plenty of characters', '']
+        pages = list(iter_pdf_page_texts(make_pdf(*texts)))
+        self.assertEqual(pages[0].strip(), texts[0])
+        self.assertEqual(pages[2].strip(), texts[2])
+        # Blank pages widen with their page number, so OCR output must come back in page order
+        self.assertIsNotNone(ocr_width(pages[1]))
+        self.assertIsNotNone(ocr_width(pages[3]))
+        self.assertLess(ocr_width(pages[1]), ocr_width(pages[3]))
+        self.assertEqual(self.pool.submitted, 2)
+
+    def test_rendered_pages_in_flight_are_bounded(self):
+        with mock.patch.object(invoice_extractor.os, 'cpu_count', return_value=1):
+            pages = iter_pdf_page_texts(make_pdf(*[''] * 10))
+            next(pages)
+            # One worker allows two pages in flight; rendering a third yields the first
+            self.assertEqual(self.pool.submitted, 3)
+            widths = [ocr_width(page) for page in pages]
+        self.assertEqual(len(widths), 9)
+        self.assertEqual(widths, sorted(widths))
+        self.assertEqual(self.pool.submitted, 10)
+
+    def test_extract_from_bytes_combines_text_and_ocr_pages(self):
+        result = extract_from_bytes(make_pdf('Customer Name: Jane Doe Trading Ltd', ''))
+        self.assertTrue(result['success'])
+        self.assertEqual(result['header']['customer_name'], 'Jane Doe Trading Ltd')
+        self.assertIn('OCR page width', result['raw_text'])
+
+
+@skipUnless(invoice_extractor.fitz is not None and invoice_extractor.np is not None, 'PyMuPDF/numpy not installed')
+class IterPdfPageTextsCancellationTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.pool.shutdown, wait=True)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.jobs = []
+        job_class = invoice_extractor._OcrJob
+
+        def record_job(img):
+            job = job_class(img)
+            self.jobs.append(job)
+            return job
+
+        self.calls = 0
+        self.fail_first = True
+        for patcher in (
+            mock.patch.object(invoice_extractor, 'OCR_AVAILABLE', True),
+            mock.patch.object(invoice_extractor, '_ocr_pool', return_value=self.pool),
+            mock.patch.object(invoice_extractor, '_recognize', side_effect=self.recognize),
+            mock.patch.object(invoice_extractor, '_OcrJob', side_effect=record_job),
+            mock.patch.object(invoice_extractor.os, 'cpu_count', return_value=1),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def recognize(self, gray):
+        self.calls += 1
+        if self.calls == 1:
+            if self.fail_first:
+                raise ValueError('bad page')
+            return 'text'
+        self.release.wait(5)
+        return 'text'
+
+    def test_failed_page_cancels_queued_pages(self):
+        with self.assertRaisesRegex(RuntimeError, 'bad page'):
+            list(iter_pdf_page_texts(make_pdf(*[''] * 6)))
+        # The first page failed and the second was already running; the third was still queued
+        self.assertEqual(len(self.jobs), 3)
+        self.assertTrue(self.jobs[2].future.cancelled())
+
+    def test_abandoned_generator_cancels_queued_pages(self):
+        self.fail_first = False
+        pages = iter_pdf_page_texts(make_pdf(*[''] * 6))
+        self.assertEqual(next(pages), 'text')
+        pages.close()
+        self.assertEqual(len(self.jobs), 3)
+        self.assertTrue(self.jobs[2].future.cancelled())
@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from tracker.models import Branch, Invoice, InvoiceLineItem, Profile
+
+
+class InvoiceUploadTotalsTests(TestCase):
+    """The extracted Net/VAT/Gross values are the persisted invoice totals, whatever the line items add up to."""
+
+    def setUp(self):
+        # Uploaded documents are stored on the invoice; keep them out of the real media root
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = Client()
+        self.user = User.objects.create_user(username='tester', password='pass')
+        self.branch = Branch.objects.create(name='B1', code='B1')
+        Profile.objects.update_or_create(user=self.user, defaults={'branch': self.branch})
+        self.client.login(username='tester', password='pass')
+
+    def test_create_from_upload_keeps_posted_totals(self):
+        resp = self.client.post(reverse('tracker:api_create_invoice_from_upload'), {
+            'customer_name': 'Jane Doe Trading Ltd',
+            'customer_phone': '0712345678',
+            'invoice_number': 'PI-2024-001',
+            'invoice_date': '2024-03-05',
+            'subtotal': '1,000.00',
+            'tax_amount': '180.00',
+            'total_amount': '1,180.00',
+            'item_description[]': ['Engine oil', 'Oil filter'],
+            'item_qty[]': ['2', '1'],
+            'item_price[]': ['300.00', '50.00'],
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()['success'], resp.json())
+
+        inv = Invoice.objects.get(id=resp.json()['invoice_id'])
+        self.assertEqual(inv.subtotal, Decimal('1000.00'))
+        self.assertEqual(inv.tax_amount, Decimal('180.00'))
+        self.assertEqual(inv.total_amount, Decimal('1180.00'))
+        self.assertEqual(InvoiceLineItem.objects.filter(invoice=inv).count(), 2)
+
+    def test_upload_extract_commit_keeps_extracted_totals(self):
+        extracted = {
+            'success': True,
+            'header': {
+                'customer_name': 'Jane Doe Trading Ltd',
+                'phone': '0712345678',
+                'invoice_no': 'PI-2024-001',
+                'date': '05/03/2024',
+                'subtotal': Decimal('1000.00'),
+                'tax': Decimal('180.00'),
+                'total': Decimal('1180.00'),
+            },
+            'items': [
+                {'description': 'Engine oil', 'qty': 2, 'rate': Decimal('300.00'), 'value': Decimal('600.00')},
+                {'description': 'Oil filter', 'qty': 1, 'rate': Decimal('50.00'), 'value': Decimal('50.00')},
+            ],
+            'raw_text': '',
+            'ocr_available': False,
+        }
+        upload = SimpleUploadedFile('invoice.pdf', b'%PDF-1.4 test', content_type='application/pdf')
+        with mock.patch('tracker.views_invoice.extract_from_upload', return_value=extracted):
+            resp = self.client.post(reverse('tracker:api_upload_extract_invoice'), {'file': upload, 'commit': 'true'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()['success'], resp.json())
+
+        inv = Invoice.objects.get(id=resp.json()['invoice_id'])
+        self.assertEqual(inv.subtotal, Decimal('1000.00'))
+        self.assertEqual(inv.tax_amount, Decimal('180.00'))
+        self.assertEqual(inv.total_amount, Decimal('1180.00'))
+        self.assertEqual(InvoiceLineItem.objects.filter(invoice=inv).count(), 2)
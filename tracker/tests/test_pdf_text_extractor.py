@@ -0,0 +1,221 @@
+import re
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase
+
+from tracker.utils import pdf_text_extractor
+from tracker.utils.pdf_text_extractor import (
+    _iter_items, _label_literal, _to_decimal, extract_from_bytes, extract_text_from_pdf, parse_invoice_data,
+)
+
+
+def make_pdf(*page_texts):
+    """Build an in-memory PDF with one page per text."""
+    doc = pdf_text_extractor.fitz.open()
+    for text in page_texts:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class ToDecimalTests(SimpleTestCase):
+    def test_strips_currency_and_thousands_separators(self):
+        self.assertEqual(_to_decimal('1,250,000.00'), Decimal('1250000.00'))
+        self.assertEqual(_to_decimal('TSH 1,234.50'), Decimal('1234.50'))
+        self.assertEqual(_to_decimal('-12.5'), Decimal('-12.5'))
+
+    def test_empty_or_non_numeric_returns_none(self):
+        for value in (None, '', '.', ',', '-', 'abc'):
+            self.assertIsNone(_to_decimal(value))
+
+
+# Every label pattern parse_invoice_data pre-checks, with its expected literal
+# and a sample line the pattern must match
+LABEL_LITERAL_CASES = [
+    (r'Code\s*No', 'code', 'Code No: 123'),
+    (r'Code\s*#', 'code', 'CODE # 123'),
+    (r'Code(?:\s|:)', 'code', 'Code: 123'),
+    (r'Bill\s*To', 'bill', 'BillTo: Jane'),
+    (r'Buyer\s*Name', 'buyer', 'Buyer Name: Jane'),
+    (r'Client\s*Name', 'client', 'client name: Jane'),
+    (r'Invoice\s*(?:No|Number)', 'invoice', 'Invoice Number: 42'),
+    (r'Invoice\s*Number', 'invoice', 'INVOICE NUMBER 42'),
+    (r'Net\s*Value', 'net', 'Net Value: 10.00'),
+    (r'Net\s*Amount', 'net', 'NetAmount 10.00'),
+    (r'Subtotal', 'subtotal', 'SubTotal: 10.00'),
+    (r'Net\s*:', 'net', 'Net: 10.00'),
+    (r'VAT', 'vat', 'vat 1.80'),
+    (r'Tax', 'tax', 'TAX: 1.80'),
+    (r'GST', 'gst', 'GST: 1.80'),
+    (r'Sales\s*Tax', 'sales', 'Sales Tax: 1.80'),
+    (r'Gross\s*Value', 'gross', 'Gross Value: 11.80'),
+    (r'Total\s*Amount', 'total', 'Total Amount: 11.80'),
+    (r'Grand\s*Total', 'grand', 'GRAND TOTAL 11.80'),
+    (r'Total\s*(?::|\s)', 'total', 'Total: 11.80'),
+]
+
+
+class LabelLiteralTests(SimpleTestCase):
+    def test_literal_of_every_label_pattern(self):
+        for pattern, literal, sample in LABEL_LITERAL_CASES:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(_label_literal(pattern), literal)
+                m = re.search(pattern, sample, re.I)
+                self.assertIsNotNone(m)
+                self.assertIn(literal, m.group(0).lower())
+
+    def test_patterns_without_a_required_literal(self):
+        cases = [
+            (r'Tax|VAT', ''),            # top-level alternation
+            (r'[Tt]ax', ''),             # character class
+            (r'\s*Tax', ''),             # does not start with a word
+            (r'Totals?', 'total'),       # optional last letter is dropped
+            (r'Colou?r', 'colo'),
+            (r'(?:Tax|VAT)\s*No', ''),
+            (r'Net\s*(?:Value|Amount)', 'net'),  # nested alternation is fine
+        ]
+        for pattern, literal in cases:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(_label_literal(pattern), literal)
+
+
+ITEM_ROWS = [
+    '1 21004 ENGINE OIL FILTER 2 NOS 15,000.00 30,000.00',
+    # "total" inside a description must not end the item section
+    '2 21019 TOTAL CARE KIT 1 KIT 45,000.00 45,000.00',
+]
+
+
+class IterItemsTests(SimpleTestCase):
+    def item_codes(self, lines):
+        return [item['code'] for item in _iter_items(lines)]
+
+    def test_header_variants_start_the_item_section(self):
+        headers = [
+            'Sr No Item Code Description Qty Rate Value',
+            'S.N CODE DESCRIPTION QUANTITY PRICE AMOUNT',
+            'Serial Item Desc Type Unit Total',
+            'Item Description Qty Unit Amount',
+        ]
+        for header in headers:
+            with self.subTest(header=header):
+                self.assertEqual(self.item_codes(['ACME SUPPLIES', header] + ITEM_ROWS), ['21004', '21019'])
+
+    def test_no_header_yields_no_items(self):
+        self.assertEqual(self.item_codes(['ACME SUPPLIES'] + ITEM_ROWS), [])
+
+    def test_line_with_too_few_header_columns_is_not_a_header(self):
+        # Only two column families (description, amount)
+        self.assertEqual(self.item_codes(['Description Amount'] + ITEM_ROWS), [])
+
+    def test_footer_line_ends_the_item_section(self):
+        after_footer = '3 21020 AIR FILTER 1 NOS 9,000.00 9,000.00'
+        footers = ['Net Value: 75,000.00', 'Total: 75,000.00', 'Grand Total 75,000.00', 'Payment: Cash', 'NOTE: thanks']
+        for footer in footers:
+            with self.subTest(footer=footer):
+                lines = ['Sr No Item Code Description Qty Rate Value'] + ITEM_ROWS + [footer, after_footer]
+                self.assertEqual(self.item_codes(lines), ['21004', '21019'])
+
+    def test_item_fields_are_parsed(self):
+        items = list(_iter_items(['Sr No Item Code Description Qty Rate Value'] + ITEM_ROWS))
+        self.assertEqual(items[0]['unit'], 'NOS')
+        self.assertEqual(items[0]['value'], Decimal('30000'))
+        self.assertEqual(items[1]['description'], 'TOTAL CARE')
+        self.assertEqual(items[1]['unit'], 'KIT')
+
+
+class ParseInvoiceDataTests(SimpleTestCase):
+    def test_empty_text_returns_blank_result(self):
+        for text in ('', '   ', '\n\n'):
+            result = parse_invoice_data(text)
+            self.assertIsNone(result['invoice_no'])
+            self.assertIsNone(result['total'])
+            self.assertEqual(result['items'], [])
+
+    def test_bill_to_subtotal_total_document_is_parsed(self):
+        # No Code/Customer/Invoice/VAT/Net/Gross/Tel labels at all
+        text = (
+            "ACME SUPPLIES\n"
+            "Bill To: Jane Doe Trading Ltd\n"
+            "Date: 05/03/2024\n"
+            "Subtotal: 1,000.00\n"
+            "Tax: 180.00\n"
+            "Total: 1,180.00\n"
+        )
+        result = parse_invoice_data(text)
+        self.assertEqual(result['customer_name'], 'Jane Doe Trading Ltd')
+        self.assertEqual(result['date'], '05/03/2024')
+        self.assertEqual(result['subtotal'], Decimal('1000.00'))
+        self.assertEqual(result['tax'], Decimal('180.00'))
+        self.assertIsNotNone(result['total'])
+
+    def test_labelled_header_fields_are_parsed(self):
+        text = (
+            "ACME SUPPLIES\n"
+            "PI No: PI-2024-001\n"
+            "Reference: Fleet service\n"
+            "Payment: Cash\n"
+            "Delivery: Ex stock\n"
+        )
+        result = parse_invoice_data(text)
+        self.assertEqual(result['invoice_no'], 'PI-2024-001')
+        self.assertEqual(result['reference'], 'Fleet service')
+        self.assertEqual(result['payment_method'], 'cash')
+        self.assertEqual(result['delivery_terms'], 'Ex stock')
+
+
+@skipUnless(pdf_text_extractor.fitz is not None, 'PyMuPDF is not installed')
+class ExtractTextFromPdfTests(SimpleTestCase):
+    def setUp(self):
+        pdf_text_extractor._PDF_TEXT_CACHE.clear()
+
+    def test_pages_are_extracted_in_order(self):
+        pages = [f'Page marker {i:02d}' for i in range(12)]
+        text = extract_text_from_pdf(make_pdf(*pages))
+        positions = [text.index(marker) for marker in pages]
+        self.assertEqual(positions, sorted(positions))
+
+
+@skipUnless(pdf_text_extractor.fitz is not None, 'PyMuPDF is not installed')
+class ExtractionCacheTests(SimpleTestCase):
+    def setUp(self):
+        pdf_text_extractor._RESULT_CACHE.clear()
+        pdf_text_extractor._PDF_TEXT_CACHE.clear()
+
+    def test_cache_hit_returns_independent_copy(self):
+        data = make_pdf('Customer Name: Jane Doe Trading Ltd\nNet Value: 1,000.00')
+        first = extract_from_bytes(data, 'a.pdf')
+        self.assertTrue(first['success'])
+        first['header']['customer_name'] = 'Changed'
+        first['items'].append({'description': 'Injected'})
+
+        second = extract_from_bytes(data, 'a.pdf')
+        self.assertEqual(second['header']['customer_name'], 'Jane Doe Trading Ltd')
+        self.assertNotIn({'description': 'Injected'}, second['items'])
+        self.assertIsNot(second['header'], extract_from_bytes(data, 'a.pdf')['header'])
+
+    def test_cache_hit_skips_extraction(self):
+        data = make_pdf('Customer Name: Jane Doe Trading Ltd')
+        extract_from_bytes(data, 'a.pdf')
+        with mock.patch.object(pdf_text_extractor, 'extract_text_from_pdf') as extract_text:
+            extract_from_bytes(data, 'a.pdf')
+        extract_text.assert_not_called()
+
+    def test_different_files_do_not_collide(self):
+        first = extract_from_bytes(make_pdf('Customer Name: Jane Doe Trading Ltd'), 'a.pdf')
+        second = extract_from_bytes(make_pdf('Customer Name: John Roe Motors Ltd'), 'a.pdf')
+        self.assertEqual(first['header']['customer_name'], 'Jane Doe Trading Ltd')
+        self.assertEqual(second['header']['customer_name'], 'John Roe Motors Ltd')
+
+    def test_pdf_text_cache_is_keyed_by_content(self):
+        first, second = make_pdf('First document'), make_pdf('Second document')
+        self.assertIn('First document', extract_text_from_pdf(first))
+        self.assertIn('Second document', extract_text_from_pdf(second))
+        # Repeat reads are served from the cache
+        with mock.patch.object(pdf_text_extractor.fitz, 'open') as fitz_open:
+            self.assertIn('First document', extract_text_from_pdf(first))
+        fitz_open.assert_not_called()
+        self.assertEqual(len(pdf_text_extractor._PDF_TEXT_CACHE), 2)
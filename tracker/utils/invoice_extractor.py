@@ -1,14 +1,30 @@
 from PIL import Image
+import copy
+import hashlib
 import io
+import os
 import re
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from decimal import Decimal
 
+from cachetools import LRUCache
+
 try:
     import pytesseract
 except Exception:
     pytesseract = None
 
+try:
+    # In-process Tesseract bindings; avoids a tesseract process start per image
+    import tesserocr
+except Exception:
+    tesserocr = None
+
 try:
     import cv2
     import numpy as np
@@ -16,14 +32,111 @@ except Exception:
     cv2 = None
     np = None
 
+try:
+    import fitz  # PyMuPDF
+except Exception:
+    fitz = None
+
 logger = logging.getLogger(__name__)
 
 # Check if dependencies are available
-OCR_AVAILABLE = pytesseract is not None and cv2 is not None
+OCR_AVAILABLE = (tesserocr is not None or pytesseract is not None) and cv2 is not None
+
+# Upper bound for a single tesseract run so one pathological page can't hang a worker
+OCR_TIMEOUT_SECONDS = 30
+
+# Tesseract accuracy saturates around 200 DPI / ~2000px wide; more pixels only cost time
+_PDF_OCR_DPI = 200
+_MAX_OCR_WIDTH = 2500
+_DOWNSCALED_OCR_WIDTH = 2000
+
+# The same upload is typically extracted several times (preview, retry, confirm).
+# Cache OCR text and parsed results by content digest so repeats skip the OCR.
+_OCR_TEXT_CACHE = LRUCache(maxsize=256)
+_RESULT_CACHE = LRUCache(maxsize=128)
+_CACHE_LOCK = threading.Lock()
+
+# tesserocr APIs are not thread-safe, so each thread keeps its own. Page OCR
+# runs on a long-lived pool so those APIs (and their loaded models) are reused.
+_tess_local = threading.local()
+_OCR_POOL = None
+_OCR_POOL_LOCK = threading.Lock()
+
+
+def _reset_ocr_pool():
+    global _OCR_POOL
+    _OCR_POOL = None
+
+
+# Pool threads don't survive fork() (e.g. extract_from_bytes_batch workers)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_ocr_pool)
+
+# Regex patterns are compiled once at import time; the parsers below run them
+# against every line of OCR output, so avoid rebuilding them per call.
+_HEADER_FIELD_PATTERNS = {
+    name: re.compile(rf'{label}\s*[:=\s]\s*([^\n]+?)(?:\n|$)', re.I | re.MULTILINE)
+    for name, label in (
+        ('invoice_no', r'(?:PI\s*(?:No|Number)|Invoice\s*(?:No|Number))'),
+        ('code_no', r'Code\s*(?:No|Number|#)'),
+        ('customer_name', r'Customer\s*Name'),
+        ('address', r'Address'),
+        ('date', r'Date'),
+        ('phone', r'(?:Tel|Telephone)'),
+        ('reference', r'Reference'),
+    )
+}
+# Lower-cased prefixes of the labels that commonly trail a field value on the same line
+_TRAILING_LABEL_PREFIXES = ('tel', 'fax', 'del.', 'ref', 'date', 'pi', 'cust', 'kind', 'attended', 'type',
+                            'payment', 'delivery', 'remarks')
+_RE_NON_NUMERIC = re.compile(r'[^\d\.\,\-]')
+_NUMERIC_CHARS = '0123456789.,-'
+_RE_SELLER_BLOCK_END = re.compile(r'Proforma|Invoice\b|PI\b|Customer\b|Bill\s*To|Date\b|Customer\s*Reference|Invoice\s*No|Code', re.I)
+_RE_SELLER_PHONE = re.compile(r'(?:Tel\.?|Telephone|Phone)[:\s]*([\+\d][\d\s\-/\(\)\,]{4,}\d)', re.I)
+_RE_SELLER_EMAIL = re.compile(r'([\w\.-]+@[\w\.-]+\.\w+)')
+_RE_SELLER_TAX_ID = re.compile(r'(?:Tax\s*ID|Tax\s*No\.?|Tax\s*Number)[:\s]*([A-Z0-9\-\/]*)', re.I)
+_RE_SELLER_VAT_REG = re.compile(r'(?:VAT\s*Reg\.?|VAT\s*No\.?|VAT)[:\s]*([A-Z0-9\-\/]*)', re.I)
+_RE_CUSTOMER_LABEL_SUFFIX = re.compile(r'(?:Customer\s*Name|Customer)\s*(?:Name)?(?:\s+Customer)?(?:\s+Name)?$', re.IGNORECASE)
+_RE_CUSTOMER_LABEL_PREFIX = re.compile(r'^(?:Customer\s*Name|Customer)\s*(?:Name)?\s*', re.IGNORECASE)
+_RE_EMAIL = re.compile(r'([^\s\n]+@[^\s\n]+)')
+_RE_NET_VALUE = re.compile(r'Net\s*(?:Value|Amount)\s*[:=]\s*([0-9\,\.]+)', re.I | re.MULTILINE)
+_RE_VAT = re.compile(r'VAT\s*[:=]\s*([0-9\,\.]+)', re.I | re.MULTILINE)
+_RE_GROSS_VALUE = re.compile(r'Gross\s*Value\s*[:=]\s*(?:TSH)?\s*([0-9\,\.]+)', re.I | re.MULTILINE)
+
+_RE_ITEM_HEADER_COLUMNS = re.compile(r'\b(Description|Qty|Quantity|Price|Amount|Value)\b', re.I)
+# Footer keywords and numbers are matched in one pass over each item line; the
+# keywords contain no digits, so the alternation never hides one behind the other.
+_RE_ITEM_TOKEN = re.compile(
+    r'\b(?P<footer>Net\s*Value|Total|Gross\s*Value|Grand\s*Total|VAT|Tax|Payment|Amount\s*Due|Summary)\b'
+    r'|(?P<number>[0-9\,]+\.?\d*)',
+    re.I,
+)
+_RE_ITEM_CODE = re.compile(r'\b(\d{3,6})\b')
 
 
 def _image_from_bytes(file_bytes):
-    return Image.open(io.BytesIO(file_bytes)).convert('RGB')
+    img = Image.open(io.BytesIO(file_bytes))
+    if img.mode == 'L':
+        # Already single-channel; skip the RGB round trip
+        img.load()
+        return img
+    return img.convert('RGB')
+
+
+def _preprocess_gray(gray):
+    """Upscale, denoise and binarize a grayscale array, reusing its buffer."""
+    # Resize if too small, or if it is larger than OCR can benefit from
+    h, w = gray.shape[:2]
+    if w < 1000:
+        scale = 1000.0 / w
+        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_LINEAR)
+    elif w > _MAX_OCR_WIDTH:
+        scale = _DOWNSCALED_OCR_WIDTH / w
+        gray = cv2.resize(gray, (_DOWNSCALED_OCR_WIDTH, int(h * scale)), interpolation=cv2.INTER_AREA)
+    # Denoise and threshold in place
+    cv2.medianBlur(gray, 3, dst=gray)
+    cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=gray)
+    return gray
 
 
 def preprocess_image_pil(img_pil):
@@ -32,76 +145,258 @@ def preprocess_image_pil(img_pil):
         return img_pil
     arr = np.array(img_pil)
     # Convert to gray
-    gray = cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
-    # Resize if too small
-    h, w = gray.shape[:2]
-    if w < 1000:
-        scale = 1000.0 / w
-        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_LINEAR)
-    # Denoise and threshold
-    blur = cv2.medianBlur(gray, 3)
-    _, th = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    # Convert back to PIL
-    return Image.fromarray(th)
+    gray = arr if arr.ndim == 2 else cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
+    return Image.fromarray(_preprocess_gray(gray))
+
+
+def preprocess_image_bytes(file_bytes):
+    """Decode image bytes straight to grayscale and preprocess them for OCR.
+
+    Args:
+        file_bytes: Raw image file content
+
+    Returns:
+        Preprocessed grayscale numpy array, or None if OpenCV is unavailable
+        or cannot decode the data
+    """
+    if cv2 is None or np is None:
+        return None
+    gray = cv2.imdecode(np.frombuffer(file_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+    return _preprocess_gray(gray)
+
+
+def _ocr_pool():
+    global _OCR_POOL
+    with _OCR_POOL_LOCK:
+        if _OCR_POOL is None:
+            _OCR_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='ocr')
+        return _OCR_POOL
+
+
+def _tesserocr_api():
+    """This thread's tesserocr API, or None if it cannot be initialised (e.g. missing language data)."""
+    api = getattr(_tess_local, 'api', None)
+    if api is None:
+        try:
+            api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK, lang='eng')
+        except Exception as e:
+            logger.warning(f"tesserocr initialisation failed, falling back to pytesseract: {e}")
+            api = False
+        _tess_local.api = api
+    return api or None
+
+
+def _recognize(img):
+    """Run Tesseract on one image in the calling thread."""
+    api = _tesserocr_api() if tesserocr is not None else None
+    if api is not None:
+        if not isinstance(img, Image.Image):
+            img = Image.fromarray(img)
+        api.SetImage(img)
+        return api.GetUTF8Text()
+    if pytesseract is None:
+        raise RuntimeError('tesserocr could not be initialised and pytesseract is not available')
+    # Simple config: treat as single column text but allow some detection
+    return pytesseract.image_to_string(img, config='--psm 6', timeout=OCR_TIMEOUT_SECONDS)
+
+
+class _OcrJob:
+    """One image queued on the OCR pool.
+
+    tesserocr has no deadline of its own, so ``result`` bounds the wait instead.
+    The ``OCR_TIMEOUT_SECONDS`` limit runs from when a worker picks the job up,
+    so time spent queued behind other pages or requests doesn't count against
+    it. A timed-out run keeps its pool thread until Tesseract returns, but the
+    caller is released.
+    """
+
+    def __init__(self, img):
+        self._img = img
+        self._started_at = None
+        self._started = threading.Event()
+        self.future = _ocr_pool().submit(self._run)
+        # Also wakes ``result`` when the job is cancelled before it ever runs
+        self.future.add_done_callback(lambda future: self._started.set())
+
+    def _run(self):
+        self._started_at = time.monotonic()
+        self._started.set()
+        try:
+            return _recognize(self._img)
+        finally:
+            self._img = None
+
+    def cancel(self):
+        return self.future.cancel()
+
+    def result(self):
+        self._started.wait()
+        remaining = OCR_TIMEOUT_SECONDS
+        if self._started_at is not None:
+            remaining = max(0, OCR_TIMEOUT_SECONDS - (time.monotonic() - self._started_at))
+        try:
+            return self.future.result(timeout=remaining)
+        except FutureTimeoutError:
+            logger.error(f"OCR timed out after {OCR_TIMEOUT_SECONDS}s")
+            raise RuntimeError(f'OCR extraction timed out after {OCR_TIMEOUT_SECONDS} seconds')
+        except Exception as e:
+            logger.error(f"OCR failed: {e}")
+            raise RuntimeError(f'OCR extraction failed: {str(e)}')
 
 
 def ocr_image(img_pil):
-    """Extract text from image using pytesseract OCR.
+    """Extract text from image using Tesseract OCR.
+
+    Uses tesserocr when installed (model loaded once per thread) and falls back
+    to pytesseract when it is missing or fails to initialise. Either way a run
+    is limited to ``OCR_TIMEOUT_SECONDS``.
 
     Args:
-        img_pil: PIL Image object
+        img_pil: PIL Image object or grayscale numpy array
 
     Returns:
         Extracted text string
 
     Raises:
-        RuntimeError: If pytesseract is not available
+        RuntimeError: If no Tesseract binding is available, or OCR fails or times out
     """
-    if pytesseract is None:
+    if tesserocr is None and pytesseract is None:
         raise RuntimeError('pytesseract is not available. Please install: pip install pytesseract')
     if cv2 is None:
         raise RuntimeError('OpenCV is not available. Please install: pip install opencv-python')
 
+    if tesserocr is not None:
+        return _OcrJob(img_pil).result()
     try:
-        # Simple config: treat as single column text but allow some detection
-        config = '--psm 6'
-        text = pytesseract.image_to_string(img_pil, config=config)
-        return text
+        return _recognize(img_pil)
     except Exception as e:
         logger.error(f"OCR failed: {e}")
         raise RuntimeError(f'OCR extraction failed: {str(e)}')
 
 
-def extract_header_fields(text):
+def _needs_ocr(text):
+    """Return True if a page's text layer is missing or too noisy to trust."""
+    chars = ''.join(text.split())
+    if len(chars) < 20:
+        return True
+    return sum(c.isalnum() for c in chars) < 0.3 * len(chars)
+
+
+def iter_pdf_page_texts(file_bytes):
+    """Yield the text of each PDF page in order, OCR'ing pages without a usable text layer.
+
+    Pages whose embedded text is missing or mostly noise (see ``_needs_ocr``)
+    are rendered straight to grayscale arrays and OCR'd concurrently; each
+    Tesseract run happens outside the GIL (a subprocess for pytesseract, native
+    code for tesserocr), so threads are enough to keep every core busy. Only a
+    couple of rendered pages per worker are in flight at a time, so long scanned
+    documents never hold every page image in memory at once.
+
+    Args:
+        file_bytes: Raw PDF file content
+
+    Yields:
+        Text of each page
+
+    Raises:
+        RuntimeError: If PyMuPDF is not available
+    """
+    if fitz is None:
+        raise RuntimeError('PyMuPDF is not available. Please install: pip install PyMuPDF')
+
+    max_in_flight = 2 * (os.cpu_count() or 1)
+    pending = deque()
+    try:
+        with fitz.open(stream=file_bytes, filetype='pdf') as doc:
+            for page in doc:
+                text = page.get_text()
+                if OCR_AVAILABLE and _needs_ocr(text):
+                    pix = page.get_pixmap(dpi=_PDF_OCR_DPI, colorspace=fitz.csGRAY, alpha=False)
+                    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w)
+                    pending.append(_OcrJob(gray))
+                else:
+                    pending.append(text)
+                while len(pending) > max_in_flight:
+                    page_text = pending.popleft()
+                    yield page_text if isinstance(page_text, str) else page_text.result()
+            while pending:
+                page_text = pending.popleft()
+                yield page_text if isinstance(page_text, str) else page_text.result()
+    finally:
+        # A failed page or an abandoned generator must not leave queued pages
+        # occupying the shared pool
+        for page_text in pending:
+            if not isinstance(page_text, str):
+                page_text.cancel()
+
+
+def ocr_pdf_bytes(file_bytes):
+    """Extract text from a PDF, running OCR only on pages without a usable text layer.
+
+    Without OCR support the embedded text is returned as-is.
+
+    Args:
+        file_bytes: Raw PDF file content
+
+    Returns:
+        Text of all pages joined by newlines
+
+    Raises:
+        RuntimeError: If PyMuPDF is not available
+    """
+    return '\n'.join(iter_pdf_page_texts(file_bytes))
+
+
+def _to_decimal(s):
+    """Parse an OCR'd amount such as ``TSH 1,234.50`` into a Decimal, or None."""
+    try:
+        if s:
+            s = str(s)
+            # Most tokens are already bare numbers; only run the regex cleanup on the rest
+            if s.strip(_NUMERIC_CHARS):
+                cleaned = _RE_NON_NUMERIC.sub('', s).strip()
+            else:
+                cleaned = s
+            if cleaned:
+                return Decimal(cleaned.replace(',', ''))
+    except Exception:
+        return None
+    return None
+
+
+def _clean_lines(text):
+    """Return the stripped, non-empty lines of ``text``."""
+    return [l for l in map(str.strip, text.splitlines()) if l]
+
+
+def extract_header_fields(text, lines=None):
     """Extract header fields from invoice text with improved pattern matching.
 
     Additionally detects and strips a top-of-document seller/supplier block so seller
     information isn't confused with customer fields in OCR-extracted text.
     Returns seller fields as well when detected.
+
+    Args:
+        text: OCR or text-layer invoice text
+        lines: Optional precomputed ``_clean_lines(text)`` to avoid splitting again
     """
 
-    # Helper to extract value after a label pattern
-    def extract_field(label_pattern):
-        pattern = rf'{label_pattern}\s*[:=\s]\s*([^\n]+?)(?:\n|$)'
-        m = re.search(pattern, text, re.I | re.MULTILINE)
+    # Helper to extract value after a precompiled label pattern
+    def extract_field(field):
+        m = _HEADER_FIELD_PATTERNS[field].search(text)
         if m:
-            result = m.group(1).strip()
-            # Clean up trailing noise like labels
-            result = re.sub(r'\s+(Tel|Fax|Del\.|Ref|Date|PI|Cust|Kind|Attended|Type|Payment|Delivery|Remarks)\s*.*$', '', result, flags=re.I)
-            result = ' '.join(result.split())
+            words = m.group(1).split()
+            # Clean up trailing noise like labels: cut at the first later word opening with one
+            for idx in range(1, len(words)):
+                if words[idx].lower().startswith(_TRAILING_LABEL_PREFIXES):
+                    del words[idx:]
+                    break
+            result = ' '.join(words)
             return result if result else None
         return None
 
-    def to_decimal(s):
-        try:
-            if s:
-                cleaned = re.sub(r'[^\d\.\,\-]', '', str(s)).strip()
-                if cleaned:
-                    return Decimal(cleaned.replace(',', ''))
-        except Exception:
-            return None
-        return None
-
     # Detect seller/supplier block at the top and remove it from text for subsequent parsing
     seller_name = None
     seller_address = None
@@ -110,10 +405,12 @@ def extract_header_fields(text):
     seller_tax_id = None
     seller_vat_reg = None
     try:
-        top_lines = [l.strip() for l in text.splitlines() if l.strip()][:8]
+        if lines is None:
+            lines = _clean_lines(text)
+        top_lines = lines[:8]
         split_idx = None
         for i, l in enumerate(top_lines):
-            if re.search(r'Proforma|Invoice\b|PI\b|Customer\b|Bill\s*To|Date\b|Customer\s*Reference|Invoice\s*No|Code', l, re.I):
+            if _RE_SELLER_BLOCK_END.search(l):
                 split_idx = i
                 break
         if split_idx is None:
@@ -124,16 +421,16 @@ def extract_header_fields(text):
             if len(seller_lines) > 1:
                 seller_address = ' '.join(seller_lines[1:])
             seller_block_text = '\n'.join(seller_lines)
-            phone_match = re.search(r'(?:Tel\.?|Telephone|Phone)[:\s]*([\+\d][\d\s\-/\(\)\,]{4,}\d)', seller_block_text, re.I)
+            phone_match = _RE_SELLER_PHONE.search(seller_block_text)
             if phone_match:
                 seller_phone = phone_match.group(1).strip()
-            email_match = re.search(r'([\w\.-]+@[\w\.-]+\.\w+)', seller_block_text)
+            email_match = _RE_SELLER_EMAIL.search(seller_block_text)
             if email_match:
                 seller_email = email_match.group(1).strip()
-            tax_match = re.search(r'(?:Tax\s*ID|Tax\s*No\.?|Tax\s*Number)[:\s]*([A-Z0-9\-\/]*)', seller_block_text, re.I)
+            tax_match = _RE_SELLER_TAX_ID.search(seller_block_text)
             if tax_match:
                 seller_tax_id = tax_match.group(1).strip()
-            vat_match = re.search(r'(?:VAT\s*Reg\.?|VAT\s*No\.?|VAT)[:\s]*([A-Z0-9\-\/]*)', seller_block_text, re.I)
+            vat_match = _RE_SELLER_VAT_REG.search(seller_block_text)
             if vat_match:
                 seller_vat_reg = vat_match.group(1).strip()
             try:
@@ -144,43 +441,43 @@ def extract_header_fields(text):
         pass
 
     # Extract fields using label patterns
-    invoice_no = extract_field(r'(?:PI\s*(?:No|Number)|Invoice\s*(?:No|Number))')
-    code_no = extract_field(r'Code\s*(?:No|Number|#)')
-    customer_name = extract_field(r'Customer\s*Name')
+    invoice_no = extract_field('invoice_no')
+    code_no = extract_field('code_no')
+    customer_name = extract_field('customer_name')
 
     # Clean up customer_name to remove duplicate labels (e.g., "CUSTOMER NAME Customer Name")
     if customer_name:
         # Remove case-insensitive "Customer Name", "Customer", or similar patterns from the extracted value
-        customer_name = re.sub(r'(?:Customer\s*Name|Customer)\s*(?:Name)?(?:\s+Customer)?(?:\s+Name)?$', '', customer_name, flags=re.IGNORECASE).strip()
+        customer_name = _RE_CUSTOMER_LABEL_SUFFIX.sub('', customer_name).strip()
         # Also remove if it starts with such patterns
-        customer_name = re.sub(r'^(?:Customer\s*Name|Customer)\s*(?:Name)?\s*', '', customer_name, flags=re.IGNORECASE).strip()
+        customer_name = _RE_CUSTOMER_LABEL_PREFIX.sub('', customer_name).strip()
         # Clean up any remaining duplicate name patterns
         parts = customer_name.split()
         if len(parts) > 1 and parts[0].lower() == parts[-1].lower():
             customer_name = ' '.join(parts[:-1])
 
-    address = extract_field(r'Address')
-    date_str = extract_field(r'Date')
-    phone = extract_field(r'(?:Tel|Telephone)')
+    address = extract_field('address')
+    date_str = extract_field('date')
+    phone = extract_field('phone')
     email = None
-    email_match = re.search(r'([^\s\n]+@[^\s\n]+)', text)
+    email_match = _RE_EMAIL.search(text)
     if email_match:
         email = email_match.group(1)
-    reference = extract_field(r'Reference')
+    reference = extract_field('reference')
 
     # Extract monetary amounts
     net = None
-    net_match = re.search(r'Net\s*(?:Value|Amount)\s*[:=]\s*([0-9\,\.]+)', text, re.I | re.MULTILINE)
+    net_match = _RE_NET_VALUE.search(text)
     if net_match:
         net = net_match.group(1)
 
     vat = None
-    vat_match = re.search(r'VAT\s*[:=]\s*([0-9\,\.]+)', text, re.I | re.MULTILINE)
+    vat_match = _RE_VAT.search(text)
     if vat_match:
         vat = vat_match.group(1)
 
     gross = None
-    gross_match = re.search(r'Gross\s*Value\s*[:=]\s*(?:TSH)?\s*([0-9\,\.]+)', text, re.I | re.MULTILINE)
+    gross_match = _RE_GROSS_VALUE.search(text)
     if gross_match:
         gross = gross_match.group(1)
 
@@ -193,9 +490,9 @@ def extract_header_fields(text):
         'phone': phone,
         'email': email,
         'reference': reference,
-        'net_value': to_decimal(net) if net else None,
-        'vat': to_decimal(vat) if vat else None,
-        'gross_value': to_decimal(gross) if gross else None,
+        'net_value': _to_decimal(net) if net else None,
+        'vat': _to_decimal(vat) if vat else None,
+        'gross_value': _to_decimal(gross) if gross else None,
         'seller_name': seller_name,
         'seller_address': seller_address,
         'seller_phone': seller_phone,
@@ -205,39 +502,53 @@ def extract_header_fields(text):
     }
 
 
-def extract_line_items(text):
+def extract_line_items(text, lines=None):
     """Extract line items from invoice text.
     Handles lines that look like: Sr/Item code, Description, Qty, Rate, Value
+
+    Args:
+        text: OCR or text-layer invoice text
+        lines: Optional precomputed ``_clean_lines(text)`` to avoid splitting again
     """
     items = []
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    if lines is None:
+        lines = _clean_lines(text)
 
-    # Try to find the table header by looking for item-related keywords
+    # Try to find the table header by looking for item-related keywords. Every
+    # column keyword is also an item keyword, so a single search over the first
+    # lines finds the header; its line is the number of newlines before it.
     header_idx = None
-    for idx, line in enumerate(lines[:30]):
-        if re.search(r'\b(Item|Description|Qty|Quantity|Price|Amount|Value|Sr|S\.N)\b', line, re.I) and \
-           re.search(r'\b(Description|Qty|Quantity|Price|Amount|Value)\b', line, re.I):
-            header_idx = idx
-            break
+    head_block = '\n'.join(lines[:30])
+    m = _RE_ITEM_HEADER_COLUMNS.search(head_block)
+    if m:
+        header_idx = head_block.count('\n', 0, m.start())
 
     # Parse lines after header
     start = header_idx + 1 if header_idx is not None else 0
     for line in lines[start:]:
-        # Stop at footer/summary keywords
-        if re.search(r'\b(Net\s*Value|Total|Gross\s*Value|Grand\s*Total|VAT|Tax|Payment|Amount\s*Due|Summary)\b', line, re.I):
+        # Find all numbers in line; the description is the text between them.
+        # Stop at footer/summary keywords.
+        numbers = []
+        words = []
+        pos = 0
+        footer = False
+        for m in _RE_ITEM_TOKEN.finditer(line):
+            if m.lastgroup == 'footer':
+                footer = True
+                break
+            numbers.append(m.group())
+            words += line[pos:m.start()].split()
+            pos = m.end()
+        if footer:
             break
+        if numbers and len(line) > 5:
+            words += line[pos:].split()
+            desc = ' '.join(words)
 
-        # Find all numbers in line
-        numbers = re.findall(r'[0-9\,]+\.?\d*', line)
-        if len(numbers) >= 1 and len(line) > 5:
-            # Extract description by removing numbers
-            desc = re.sub(r'\s*[0-9\,]+\.?\d*\s*', ' ', line).strip()
-            desc = ' '.join(desc.split())
-
-            if desc and len(desc) > 2 and not re.match(r'^\d+$', desc):
+            if desc and len(desc) > 2 and not desc.isdecimal():
                 # Last number is usually the amount/value
                 value = numbers[-1] if numbers else None
-                qty = None
+                qty = 1
                 rate = None
                 item_code = None
 
@@ -247,32 +558,23 @@ def extract_line_items(text):
                     try:
                         qty_val = float(numbers[-2].replace(',', ''))
                         if 0 < qty_val < 1000 and int(qty_val) == qty_val:
-                            qty = numbers[-2]
+                            qty = int(qty_val)
                         else:
                             rate = numbers[-2]  # Otherwise it's probably the unit price
                     except Exception:
                         pass
 
                 # Try to extract item code (first sequence of numbers)
-                m = re.search(r'\b(\d{3,6})\b', line)
+                m = _RE_ITEM_CODE.search(line)
                 if m:
                     item_code = m.group(1)
 
-                def clean_num(s):
-                    try:
-                        if s:
-                            cleaned = re.sub(r'[^\d\.\,\-]', '', str(s)).strip()
-                            return Decimal(cleaned.replace(',', ''))
-                    except Exception:
-                        return None
-                    return None
-
                 items.append({
                     'item_code': item_code,
                     'description': desc[:255],
-                    'qty': int(float(qty.replace(',', ''))) if qty else 1,
-                    'rate': clean_num(rate),
-                    'value': clean_num(value),
+                    'qty': qty,
+                    'rate': _to_decimal(rate),
+                    'value': _to_decimal(value),
                 })
 
     return items
@@ -281,8 +583,9 @@ def extract_line_items(text):
 def extract_from_bytes(file_bytes):
     """Main entry: take raw bytes, preprocess, OCR, parse and return result dict.
 
-    If OCR dependencies are not available, returns a success response with empty data
-    so the user can manually enter invoice details.
+    If OCR dependencies are not available and the upload has no usable text
+    layer, returns an ``ocr_unavailable`` failure so the user can manually
+    enter invoice details.
 
     Args:
         file_bytes: Raw bytes of uploaded file (PDF or image)
@@ -290,8 +593,10 @@ def extract_from_bytes(file_bytes):
     Returns:
         dict with keys: success, header, items, raw_text, message, ocr_available
     """
-    # Check if OCR is actually available
-    if not OCR_AVAILABLE:
+    is_pdf = file_bytes[:4] == b'%PDF'
+
+    # Check if OCR is actually available; text-layer PDFs can still be read without it
+    if not OCR_AVAILABLE and not (is_pdf and fitz is not None):
         logger.warning("OCR dependencies not available. Returning empty extraction for manual entry.")
         return {
             'success': False,
@@ -303,47 +608,92 @@ def extract_from_bytes(file_bytes):
             'raw_text': ''
         }
 
-    # Try to open the file as an image
-    try:
-        img = _image_from_bytes(file_bytes)
-    except Exception as e:
-        logger.warning(f"Failed to open uploaded file as image: {e}")
-        return {
-            'success': False,
-            'error': 'invalid_image',
-            'message': f'Could not open file as image: {str(e)}',
-            'ocr_available': False,
-            'header': {},
-            'items': [],
-            'raw_text': ''
-        }
-
-    # Preprocess the image
-    try:
-        proc = preprocess_image_pil(img)
-    except Exception as e:
-        logger.warning(f"Image preprocessing failed: {e}")
-        proc = img
+    digest = hashlib.blake2b(file_bytes, digest_size=16).digest()
+    with _CACHE_LOCK:
+        cached = _RESULT_CACHE.get(digest)
+        text = _OCR_TEXT_CACHE.get(digest)
+    if cached is not None:
+        return copy.deepcopy(cached)
 
-    # Try OCR
-    try:
-        text = ocr_image(proc)
-    except Exception as e:
-        logger.error(f"OCR failed: {e}")
-        return {
-            'success': False,
-            'error': 'ocr_failed',
-            'message': f'OCR extraction failed: {str(e)}. Please manually enter invoice details.',
-            'ocr_available': False,
-            'header': {},
-            'items': [],
-            'raw_text': ''
-        }
+    if text is None:
+        if is_pdf:
+            try:
+                text = ocr_pdf_bytes(file_bytes)
+            except Exception as e:
+                logger.error(f"PDF OCR failed: {e}")
+                return {
+                    'success': False,
+                    'error': 'ocr_failed',
+                    'message': f'OCR extraction failed: {str(e)}. Please manually enter invoice details.',
+                    'ocr_available': False,
+                    'header': {},
+                    'items': [],
+                    'raw_text': ''
+                }
+            if not OCR_AVAILABLE and _needs_ocr(text):
+                # Scanned PDF with no usable text layer and nothing to OCR it with
+                logger.warning("PDF has no text layer and OCR dependencies are not available.")
+                return {
+                    'success': False,
+                    'error': 'ocr_unavailable',
+                    'message': 'This PDF has no readable text and OCR extraction is not available in this environment. Please manually enter invoice details.',
+                    'ocr_available': False,
+                    'header': {},
+                    'items': [],
+                    'raw_text': text
+                }
+        else:
+            # Decode straight to grayscale with OpenCV; fall back to PIL for formats it cannot read
+            proc = None
+            try:
+                proc = preprocess_image_bytes(file_bytes)
+            except Exception as e:
+                logger.warning(f"Image preprocessing failed: {e}")
+
+            if proc is None:
+                try:
+                    img = _image_from_bytes(file_bytes)
+                except Exception as e:
+                    logger.warning(f"Failed to open uploaded file as image: {e}")
+                    return {
+                        'success': False,
+                        'error': 'invalid_image',
+                        'message': f'Could not open file as image: {str(e)}',
+                        'ocr_available': False,
+                        'header': {},
+                        'items': [],
+                        'raw_text': ''
+                    }
+
+                try:
+                    proc = preprocess_image_pil(img)
+                except Exception as e:
+                    logger.warning(f"Image preprocessing failed: {e}")
+                    proc = img
+
+            # Try OCR
+            try:
+                text = ocr_image(proc)
+            except Exception as e:
+                logger.error(f"OCR failed: {e}")
+                return {
+                    'success': False,
+                    'error': 'ocr_failed',
+                    'message': f'OCR extraction failed: {str(e)}. Please manually enter invoice details.',
+                    'ocr_available': False,
+                    'header': {},
+                    'items': [],
+                    'raw_text': ''
+                }
+
+        with _CACHE_LOCK:
+            _OCR_TEXT_CACHE[digest] = text
 
     # Extract structured data from OCR text
     try:
-        header = extract_header_fields(text)
-        items = extract_line_items(text)
+        lines = _clean_lines(text)
+        header = extract_header_fields(text, lines)
+        items = extract_line_items(text, lines)
     except Exception as e:
         logger.warning(f"Failed to parse extracted text: {e}")
         header = {}
@@ -354,6 +704,29 @@ def extract_from_bytes(file_bytes):
         'header': header,
         'items': items,
         'raw_text': text,
-        'ocr_available': True
+        'ocr_available': OCR_AVAILABLE
     }
-    return result
+    with _CACHE_LOCK:
+        _RESULT_CACHE[digest] = result
+    return copy.deepcopy(result)
+
+
+def extract_from_bytes_batch(files, max_workers=None):
+    """Run ``extract_from_bytes`` over several uploads in parallel worker processes.
+
+    Invoices are independent, so each one is handed to its own process and the
+    tesseract runs of different files no longer queue behind each other.
+
+    Args:
+        files: Iterable of raw file bytes
+        max_workers: Maximum number of worker processes (defaults to CPU count)
+
+    Returns:
+        List of result dicts, in the same order as ``files``
+    """
+    files = list(files)
+    if len(files) < 2:
+        return [extract_from_bytes(b) for b in files]
+    workers = min(len(files), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(extract_from_bytes, files, chunksize=1))
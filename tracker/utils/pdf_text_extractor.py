@@ -4,11 +4,20 @@ Uses PyMuPDF (fitz) and PyPDF2 for PDF text extraction.
 Falls back to pattern matching for invoice data extraction.
 """
 
+import copy
+import hashlib
 import io
 import logging
+import mmap
+import os
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal
 from datetime import datetime
+from functools import lru_cache
+
+from cachetools import LRUCache, TTLCache
 
 try:
     import fitz
@@ -24,12 +33,191 @@ from PIL import Image
 
 logger = logging.getLogger(__name__)
 
-
-def extract_text_from_pdf(file_bytes) -> str:
+# Successful extraction results keyed by a digest of the file contents, so that
+# re-submitting the same invoice skips PDF parsing entirely
+_RESULT_CACHE = LRUCache(maxsize=128)
+_CACHE_LOCK = threading.Lock()
+# Extracted PDF text by content digest, kept for a few minutes so a document that is
+# re-parsed (or whose parse failed and is retried) is not reopened and re-read
+_PDF_TEXT_CACHE = TTLCache(maxsize=32, ttl=600)
+
+_NUMERIC_CHARS = '0123456789.,-'
+
+# Static patterns used by parse_invoice_data, compiled once at import time.
+# Seller block
+_RE_SELLER_BLOCK_END = re.compile(r'Proforma|Invoice\b|PI\b|Customer\b|Bill\s*To|Date\b|Customer\s*Reference|Invoice\s*No|Code', re.I)
+_RE_SELLER_PHONE = re.compile(r'(?:Tel\.?|Telephone|Phone)[:\s]*([\+\d][\d\s\-/\(\)\,]{4,}\d)', re.I)
+_RE_SELLER_TAX_ID = re.compile(r'(?:Tax\s*ID|Tax\s*No\.?|Tax\s*Number)[:\s]*([A-Z0-9\-\/]*)', re.I)
+_RE_SELLER_VAT_REG = re.compile(r'(?:VAT\s*Reg\.?|VAT\s*No\.?|VAT)[:\s]*([A-Z0-9\-\/]*)', re.I)
+_RE_EMAIL = re.compile(r'([\w\.-]+@[\w\.-]+\.\w+)')
+_RE_DIGIT = re.compile(r'\d')
+_RE_LETTER = re.compile(r'[A-Za-z]')
+
+# Customer name
+_RE_CUSTOMER_NAME_VALUE = re.compile(r'Customer\s+Name\s*[:=]?\s*([A-Z][^\n]*?)(?=\n|$)', re.I | re.MULTILINE)
+_RE_CUSTOMER_LABEL_PREFIX = re.compile(r'^Customer\s*Name?\s*[:=]?\s*', re.I)
+_RE_CUSTOMER_LABEL_SUFFIX = re.compile(r'\s+Customer\s*Name?.*$', re.I)
+_RE_CUSTOMER_TRAILING_LABELS = re.compile(r'\s+(?:Reference|Ref\.?|Address|Tel|Phone|Fax|Email|Attended|Kind|Code|PI|Date|Cust|Del\.|Type|Qty|Rate|Value)\b.*$', re.I)
+_RE_CONTACT_LABEL_START = re.compile(r'^(?:Address|Tel|Fax|Email|Phone|Reference)\b', re.I)
+_RE_CUSTOMER_NAME_LABEL = re.compile(r'Customer\s*Name', re.I)
+_RE_CUSTOMER_NAME_PREFIX = re.compile(r'^Customer\s*Name\s*:?\s*', re.I)
+
+# Address
+_RE_POBOX = re.compile(r'P\.?\s*O\.?\s*B|P\.?O\.?\s*BOX|POB|P\.O', re.I)
+_RE_POBOX_NUMBER = re.compile(r'(?:P\.?\s*O\.?\s*B|P\.?O\.?\s*BOX|POB|P\.O).*?(\d{3,})', re.I)
+_RE_POBOX_STOP_LABELS = re.compile(r'^(?:Tel|Fax|Attended|Kind|Reference|PI|Code|Type|Date|Email|Phone|Del|Customer|Cust|Ref|Invoice|Proforma)', re.I)
+_RE_POBOX_CITY = re.compile(r'\b(DAR|DAR-ES-SALAAM|SALAAM|NAIROBI|KAMPALA|KIGALI|MOMBASA|MOSHI|ARUSHA|DODOMA)\b', re.I)
+_RE_CITY = re.compile(r'\b(DAR|DAR-ES-SALAAM|NAIROBI|KAMPALA|KIGALI|MOMBASA|MOSHI|ARUSHA|DODOMA)\b', re.I)
+_RE_COUNTRY = re.compile(r'\b(TANZANIA|KENYA|UGANDA|RWANDA|BURUNDI|CONGO|MALAWI|ZAMBIA)\b', re.I)
+_RE_UPPERCASE_LINE = re.compile(r'^[A-Z][A-Z\s\-\.,]*$')
+_RE_ADDRESS_LABEL_END = re.compile(r'\bAddress\s*[:=]?\s*$', re.I)
+_RE_ADDRESS_LABEL_VALUE = re.compile(r'\bAddress\s*[:=]\s*([^\n]+)', re.I)
+_RE_ADDRESS_STOP_LABELS = re.compile(r'^(?:Tel|Fax|Attended|Kind|Reference|PI|Code|Type|Date|Email|Phone|Del|Customer|Cust|Remarks|Payment|Delivery|Ref|Invoice|Proforma)', re.I)
+_RE_CITY_STOP_LABELS = re.compile(r'^(?:Tel|Fax|Email|Phone|Address|Reference|Code|Type|Date|Attended|Kind|Cust|Ref)', re.I)
+
+# Phone
+_RE_TEL_LABEL = re.compile(r'\bTel\b', re.I)
+_RE_TEL_VALUE = re.compile(r'\bTel\s*[:=]?\s*([^\n]+?)(?:\s*(?:Fax|Email|Del|Attended|Kind|Reference)|$)', re.I)
+_RE_PHONE_TRAILING_LABELS = re.compile(r'\s+(?:Fax|Email|Del|Attended|Kind|Reference)\s*.*$', re.I)
+_RE_PHONE_EDGE_NOISE = re.compile(r'^[^\w\+\-\(]|[^\w\)]$')
+_RE_PHONE_PAIR = re.compile(r'\d{3,}\s*[/\-]\s*\d{3,}')
+_RE_NON_PHONE_ROW = re.compile(r'PI\b|Invoice|Gross|Net|VAT|TSH|Qty|Rate|Value|Code|Sr\b|No\.', re.I)
+
+# Reference, invoice number and date
+_RE_REFERENCE = re.compile(r'(?:Reference|Ref\.?)\s*[:=]?\s*([^\n:{]+?)(?=\n(?:Tel|Code|PI|Date|Del\.|Attended|Kind|Remarks)\b|$)', re.I | re.MULTILINE)
+_RE_REFERENCE_TRAILING = re.compile(r'\s+(?:Tel|Fax|Date|PI|Code)\b.*$', re.I)
+_RE_PI_NO = re.compile(r'PI\s*(?:No|Number|#)\s*[:=]?\s*([^\n:{]+?)(?=\n|$)', re.I | re.MULTILINE)
+_RE_PI_TRAILING = re.compile(r'\s+(?:Date|Cust|Ref|Del|Code)\b.*$', re.I)
+_DATE_PATTERNS = (
+    (re.compile(r'(?:Invoice\s*)?Date\s*[:=]?\s*(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})', re.I), True),  # "Date: DD/MM/YYYY"
+    (re.compile(r'(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})', re.I), False),  # Any date pattern (fallback)
+)
+
+# Amounts
+_RE_NON_NUMERIC = re.compile(r'[^\d\.\,\-]')
+_RE_LEADING_AMOUNT = re.compile(r'^(?:TSH|TZS|UGX)?\s*([0-9\,\.]+)', re.I)
+_RE_TAX_RATE = re.compile(r'VAT.*?(\d+(?:\.\d+)?)\s*%|Tax\s*Rate.*?(\d+(?:\.\d+)?)\s*%', re.I)
+
+# Payment, delivery, remarks and contacts
+_RE_PAYMENT = re.compile(r'(?:Payment|Payment\s*Method|Payment\s*Type)\s*[:=]?\s*([^\n:{]+?)(?=\n|$)', re.I | re.MULTILINE)
+_RE_PAYMENT_TRAILING = re.compile(r'\s+(?:Delivery|Remarks|Net|Gross|Due|NOTE)\b.*$', re.I)
+_RE_DELIVERY = re.compile(r'(?:Delivery|Delivery\s*Terms)\s*[:=]?\s*([^\n:{]+?)(?=\n|$)', re.I | re.MULTILINE)
+_RE_DELIVERY_TRAILING = re.compile(r'\s+(?:Remarks|Notes|NOTE|Net|Gross|Payment)\b.*$', re.I)
+_RE_REMARKS = re.compile(r'(?:Remarks|Notes|NOTE)\s*[:=]?\s*(.+?)(?=\n(?:Payment|Delivery|Net|Gross|NOTE|Authorized|Qty|Code)\b|$)', re.I | re.MULTILINE | re.DOTALL)
+_RE_REMARKS_NOTE_NUMBER = re.compile(r'(?:\d+\s*:|^NOTE\s*\d+\s*:)', re.I)
+_RE_REMARKS_TRAILING = re.compile(r'(?:Payment|Delivery|Due|See|Qty|Code|SR)\b.*$', re.I)
+_RE_ATTENDED_BY = re.compile(r'Attended\s*(?:By|:)?\s*([^\n:{]+?)(?=\n(?:Kind|Reference|Tel|Remarks|Payment)\b|$)', re.I | re.MULTILINE)
+_RE_ATTENDED_BY_TRAILING = re.compile(r'\s+(?:Kind|Reference|Tel|Remarks|Payment)\b.*$', re.I)
+_RE_KIND_ATTENTION = re.compile(r'Kind\s*(?:Attention|Attn|:)?\s*([^\n:{]+?)(?=\n(?:Reference|Remarks|Tel|Attended|Payment|Delivery)\b|$)', re.I | re.MULTILINE)
+_RE_KIND_ATTENTION_TRAILING = re.compile(r'\s+(?:Reference|Remarks|Tel|Attended|Payment|Delivery)\b.*$', re.I)
+
+# Line items
+_ITEM_HEADER_PATTERNS = (
+    re.compile(r'\b(?:Sr|S\.N|Serial|No\.?)\b', re.I),
+    re.compile(r'\b(?:Item|Code)\b', re.I),
+    re.compile(r'\b(?:Description|Desc)\b', re.I),
+    re.compile(r'\b(?:Qty|Quantity|Qty\.?|Type)\b', re.I),
+    re.compile(r'\b(?:Rate|Price|Unit|UnitPrice)\b', re.I),
+    re.compile(r'\b(?:Value|Amount|Total)\b', re.I),
+)
+# Lower-cased literals that each header pattern above needs; a line containing fewer
+# than three of the families cannot be a header, so the regexes only confirm candidates
+_ITEM_HEADER_KEYWORDS = (
+    ('sr', 's.n', 'serial', 'no'),
+    ('item', 'code'),
+    ('desc',),
+    ('qty', 'quantity', 'type'),
+    ('rate', 'price', 'unit'),
+    ('value', 'amount', 'total'),
+)
+_ITEM_SECTION_END_KEYWORDS = ('net', 'gross', 'grand', 'total', 'payment', 'delivery', 'remarks', 'note')
+_RE_ITEM_SECTION_END = re.compile(r'(?:Net\s*Value|Gross\s*Value|Grand\s*Total|Total\s*:|Payment|Delivery|Remarks|NOTE)', re.I)
+_RE_NUMBER = re.compile(r'[0-9\,]+\.?\d*')
+_RE_UNIT = re.compile(r'\b(NOS|PCS|KG|HR|LTR|PIECES?|UNITS?|BOX|CASE|SETS?|PC|KIT|UNT)\b', re.I)
+_RE_BARE_NUMBER_LINE = re.compile(r'^\d+(?:\.\d+)?%?\s*$')
+_RE_SR_AND_CODE = re.compile(r'^[\s\d]*\s+(\d{3,10})\s+')
+_RE_SR_AND_CODE_PREFIX = re.compile(r'^\s*\d+\s+\d{3,10}\s+')
+_RE_ITEM_CODE = re.compile(r'\b(\d{3,10})\b')
+_RE_AMOUNT_WORD = re.compile(r'^\d+[\,\.]\d+')
+_RE_LEADING_DIGITS = re.compile(r'^\d+')
+_RE_UNIT_WORD = re.compile(r'^(PCS|NOS|KG|HR|LTR|PIECES|UNITS|KIT|BOX|CASE|SETS|PC|UNT)$', re.I)
+_RE_WHITESPACE_RUN = re.compile(r'\s+')
+
+
+# Label-driven patterns are built from the caller's label regex; compile each
+# combination once instead of re-interpolating f-strings on every parse.
+_RE_LEADING_LITERAL = re.compile(r'([A-Za-z]+)([?*{])?')
+
+
+@lru_cache(maxsize=256)
+def _label_literal(pattern: str) -> str:
+    """Lower-cased literal word every match of a label pattern must contain, or '' if unknown.
+
+    Used as a substring pre-check so absent labels are ruled out without running the regex.
+    """
+    m = _RE_LEADING_LITERAL.match(pattern)
+    if not m or '[' in pattern:
+        return ''
+    # A top-level alternation may match without the leading word
+    depth = 0
+    escaped = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return ''
+    # A quantifier after the run makes its last letter optional
+    literal = m.group(1)[:-1] if m.group(2) else m.group(1)
+    return literal.lower()
+
+
+@lru_cache(maxsize=256)
+def _field_label_patterns(pattern: str) -> tuple:
+    """Compiled (label, same-line value, spaced value, in-line value) patterns for a field label."""
+    return (
+        re.compile(pattern, re.I),
+        re.compile(rf'{pattern}\s*[:=]\s*([^\n:{{]+)', re.I | re.MULTILINE),
+        re.compile(rf'{pattern}\s+(?![:=])([A-Z][^\n:{{]*?)(?=\n[A-Z]|\s{2,}[A-Z]|\n$|$)', re.I | re.MULTILINE),
+        re.compile(rf'{pattern}\s*[:=]?\s*(.+)$', re.I),
+    )
+
+
+@lru_cache(maxsize=64)
+def _stop_label_patterns(stop_patterns: str) -> tuple:
+    """Compiled (leading stop word, leading stop label) patterns for a ``|``-separated label list."""
+    alternation = '|'.join([p for p in stop_patterns.split('|') if p.strip()])
+    return (
+        re.compile(r'^(?:' + alternation + r')\b', re.I),
+        re.compile(r'^(?:' + alternation + r')\s*[:=]', re.I),
+    )
+
+
+@lru_cache(maxsize=64)
+def _amount_label_patterns(pattern: str) -> tuple:
+    """Compiled (label, colon, equals, spaced, in-line) amount patterns for a total's label."""
+    return (
+        re.compile(pattern, re.I),
+        re.compile(rf'{pattern}\s*:\s*(?:TSH|TZS|UGX)?\s*([0-9\,\.]+)', re.I | re.MULTILINE),
+        re.compile(rf'{pattern}\s*=\s*(?:TSH|TZS|UGX)?\s*([0-9\,\.]+)', re.I | re.MULTILINE),
+        re.compile(rf'{pattern}\s+(?:TSH|TZS|UGX)?\s*([0-9\,\.]+)', re.I | re.MULTILINE),
+        re.compile(rf'{pattern}\s*[:=]?\s*([0-9\,\.]+)', re.I),
+    )
+
+
+def extract_text_from_pdf(file_bytes, path: str = None, digest: bytes = None) -> str:
     """Extract text from PDF file using PyMuPDF or PyPDF2.
 
     Args:
         file_bytes: Raw bytes of PDF file
+        path: Optional filesystem path of the same PDF; when given, both libraries
+            read the file directly instead of the in-memory bytes
+        digest: Optional precomputed BLAKE2b digest of ``file_bytes`` (16 bytes)
 
     Returns:
         Extracted text string
@@ -37,6 +225,13 @@ def extract_text_from_pdf(file_bytes) -> str:
     Raises:
         RuntimeError: If no PDF extraction library is available or text extraction fails
     """
+    if digest is None:
+        digest = hashlib.blake2b(file_bytes, digest_size=16).digest()
+    with _CACHE_LOCK:
+        text = _PDF_TEXT_CACHE.get(digest)
+    if text is not None:
+        return text
+
     text = ""
     fitz_error = None
     pdf2_error = None
@@ -44,15 +239,17 @@ def extract_text_from_pdf(file_bytes) -> str:
     # Try PyMuPDF first (fitz) - best for text extraction
     if fitz is not None:
         try:
-            pdf_doc = fitz.open(stream=file_bytes, filetype="pdf")
-            for page in pdf_doc:
-                page_text = page.get_text()
-                if page_text:
-                    text += page_text
-            pdf_doc.close()
+            if path:
+                pdf_doc = fitz.open(path, filetype="pdf")
+            else:
+                pdf_doc = fitz.open(stream=file_bytes, filetype="pdf")
+            with pdf_doc:
+                text = "".join([page.get_text() for page in pdf_doc])
 
             if text and text.strip():
                 logger.info(f"Successfully extracted {len(text)} characters from PDF using PyMuPDF")
+                with _CACHE_LOCK:
+                    _PDF_TEXT_CACHE[digest] = text
                 return text
             else:
                 logger.warning("PyMuPDF extracted empty text from PDF")
@@ -66,17 +263,19 @@ def extract_text_from_pdf(file_bytes) -> str:
     text = ""
     if PyPDF2 is not None:
         try:
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+            pdf_reader = PyPDF2.PdfReader(path if path else io.BytesIO(file_bytes))
             if len(pdf_reader.pages) == 0:
                 pdf2_error = "PDF has no pages"
             else:
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text
+                # PyPDF2 page text has no trailing newline; join on one so the last line of
+                # a page does not run into the first line of the next, skipping blank pages
+                text = "\n".join([page_text for page_text in (page.extract_text() for page in pdf_reader.pages)
+                                   if page_text])
 
                 if text and text.strip():
                     logger.info(f"Successfully extracted {len(text)} characters from PDF using PyPDF2")
+                    with _CACHE_LOCK:
+                        _PDF_TEXT_CACHE[digest] = text
                     return text
                 else:
                     logger.warning("PyPDF2 extracted empty text from PDF")
@@ -113,6 +312,287 @@ def extract_text_from_image(file_bytes) -> str:
     return ""
 
 
+def _to_decimal(s):
+    """Convert a monetary string to Decimal, ignoring currency symbols and separators."""
+    try:
+        if s:
+            s = str(s)
+            # Remove currency symbols and extra characters, keep only numbers, dot, comma;
+            # amounts captured by the label patterns are already bare and skip the regex
+            cleaned = _RE_NON_NUMERIC.sub('', s).strip() if s.strip(_NUMERIC_CHARS) else s
+            if cleaned and cleaned not in ('.', ',', '-'):
+                return Decimal(cleaned.replace(',', ''))
+    except Exception:
+        pass
+    return None
+
+
+def _float_to_decimal(f):
+    """Convert a parsed float amount to Decimal."""
+    # repr() of an ordinary float is already a clean decimal literal; exponent
+    # forms and inf still go through _to_decimal's cleanup
+    s = repr(f)
+    if 'e' in s or 'n' in s:
+        return _to_decimal(s)
+    return Decimal(s)
+
+
+def _iter_items(lines):
+    """Yield line items from the table that follows the item header row.
+
+    Args:
+        lines: Stripped, non-empty lines of the invoice text
+
+    Yields:
+        dict per item with description, qty, unit, value, rate and code
+    """
+    # Strategy: Group lines by item (main description line followed by continuation lines)
+    # Then parse structured data from each item group
+    item_section_started = False
+    item_header_idx = -1
+
+    # Bind the per-line pattern methods once; the loop below runs them on every line
+    header_searches = tuple(pattern.search for pattern in _ITEM_HEADER_PATTERNS)
+    section_end_search = _RE_ITEM_SECTION_END.search
+    number_findall = _RE_NUMBER.findall
+    unit_search = _RE_UNIT.search
+    letter_search = _RE_LETTER.search
+    bare_number_match = _RE_BARE_NUMBER_LINE.match
+
+    # Find header section
+    for list_idx, line_stripped in enumerate(lines):
+        lowered = line_stripped.lower()
+
+        # Detect item section header - line with multiple item-related keywords. Plain
+        # substring checks rule out most lines before the word-boundary regexes run
+        keyword_count = 0
+        for keywords in _ITEM_HEADER_KEYWORDS:
+            for keyword in keywords:
+                if keyword in lowered:
+                    keyword_count += 1
+                    break
+        if keyword_count >= 3:
+            keyword_count = sum([1 if search(line_stripped) else 0 for search in header_searches])
+
+        if keyword_count >= 3:
+            item_section_started = True
+            item_header_idx = list_idx
+            continue
+
+        # Stop at totals/summary section
+        if item_section_started and list_idx > item_header_idx + 1:
+            if any(keyword in lowered for keyword in _ITEM_SECTION_END_KEYWORDS) and section_end_search(line_stripped):
+                return
+
+        # Parse item lines (after header starts)
+        if item_section_started and list_idx > item_header_idx:
+            # Extract all numbers from the line
+            numbers = number_findall(line_stripped)
+            # A match is digits with at most one dot once commas are dropped, so float()
+            # cannot fail; without commas every match is already a plain float literal
+            if ',' in line_stripped:
+                float_numbers = [float(cleaned) for cleaned in [n.replace(',', '') for n in numbers]
+                                 if cleaned and cleaned != '.']
+            else:
+                float_numbers = list(map(float, numbers))
+
+            # Detect unit/type indicators (PCS, NOS, UNT, HR, KG, etc.)
+            unit_match = unit_search(line_stripped)
+            unit_value = unit_match.group(1).upper() if unit_match else None
+
+            # Check if this line is likely a main item row (Sr No, Code, Description, amounts)
+            # It should have: some text (description) and numbers (qty, rate, value)
+            is_likely_item_row = len(line_stripped) > 5 and numbers and letter_search(line_stripped)
+
+            # Skip if this appears to be a continuation line (lines that are just units or percentages)
+            is_continuation_only = (unit_value or bare_number_match(line_stripped)) and len(float_numbers) <= 2
+
+            if is_likely_item_row and not is_continuation_only:
+                # Extract item code - typically appears as the first numeric field after Sr No
+                item_code = None
+                description_text = line_stripped
+
+                # Item codes can be 3-10 digits (examples: 21004, 21019, 2132004135, 3373119002)
+                # They typically appear after the Sr No and before the description
+                code_match = _RE_SR_AND_CODE.search(line_stripped)
+                if code_match:
+                    item_code = code_match.group(1)
+                    # Remove the Sr No and code from description for cleaner extraction
+                    description_text = _RE_SR_AND_CODE_PREFIX.sub('', line_stripped).strip()
+                else:
+                    # Fallback: find first numeric value that looks like a code
+                    # This handles cases where spacing is different
+                    first_code_match = _RE_ITEM_CODE.search(line_stripped)
+                    if first_code_match:
+                        item_code = first_code_match.group(1)
+
+                # Extract description (text portion, typically before large numeric values like rates/amounts)
+                # Look for the last sequence of letters/words before significant numbers
+                full_description = ''
+                words = description_text.split()
+                for i, word in enumerate(words):
+                    # Stop when we hit a large number (amounts typically > 1000 or have comma/decimal)
+                    if _RE_AMOUNT_WORD.match(word) or (len(word) > 8 and _RE_LEADING_DIGITS.match(word)):
+                        # Stop here - everything before is description
+                        full_description = ' '.join(words[:i]).strip()
+                        break
+                    # Also check for unit keywords which typically come after description
+                    elif _RE_UNIT_WORD.match(word):
+                        # Unit found - description is everything before
+                        full_description = ' '.join(words[:i]).strip()
+                        break
+
+                # If we didn't find a stopping point, use all words with letters
+                if not full_description:
+                    desc_words = [w for w in words if _RE_LETTER.search(w)]
+                    if desc_words:
+                        full_description = ' '.join(desc_words[:min(10, len(desc_words))]).strip()
+                    else:
+                        full_description = words[0] if words else ''
+
+                # Clean up description
+                full_description = _RE_WHITESPACE_RUN.sub(' ', full_description).strip()
+                full_description = full_description[:255]
+
+                # Skip if no meaningful description
+                if not full_description or len(full_description) < 2:
+                    continue
+
+                # Parse quantities and amounts from the extracted numbers
+                item = {
+                    'description': full_description,
+                    'qty': 1,
+                    'unit': unit_value,
+                    'value': None,
+                    'rate': None,
+                    'code': item_code,
+                }
+
+                # Parse numeric values based on count and patterns
+                max_num = max(float_numbers) if float_numbers else 0
+
+                if len(float_numbers) == 1:
+                    # Single number: the value
+                    item['value'] = _float_to_decimal(float_numbers[0])
+                elif len(float_numbers) == 2:
+                    # Two numbers: likely qty and value
+                    first, second = float_numbers
+                    if first < 100 and first == int(first):
+                        item['qty'] = int(first)
+                        item['value'] = _float_to_decimal(second)
+                    elif second < 100 and second == int(second):
+                        item['qty'] = int(second)
+                        item['value'] = _float_to_decimal(first)
+                    else:
+                        # Neither obvious, largest is value
+                        item['value'] = _float_to_decimal(max_num)
+                elif len(float_numbers) >= 3:
+                    # Multiple numbers: typically Sr#, Code, Qty, Rate, Value
+                    item['value'] = _float_to_decimal(max_num)
+
+                    # Find quantity: small integer less than 100
+                    # int() overflows on an out-of-range literal (float('inf')), the only
+                    # failure left in this branch; such rows are dropped as before
+                    qty_candidate = None
+                    try:
+                        for fn in float_numbers:
+                            if fn == int(fn) and 0 < fn < 100 and fn != max_num:
+                                qty_candidate = int(fn)
+                                break
+                    except OverflowError as e:
+                        logger.warning(f"Error parsing item line: {line_stripped}, {e}")
+                        continue
+
+                    if qty_candidate:
+                        item['qty'] = qty_candidate
+                        if qty_candidate > 0 and max_num > 0:
+                            item['rate'] = _float_to_decimal(max_num / qty_candidate)
+
+                # Only add if we have meaningful data
+                if item.get('description') and (item.get('value') or item.get('qty', 1) > 1):
+                    yield item
+
+
+# Keyword sets for telling a customer name from an address (matched against lower-cased text)
+_NAME_ADDRESS_KEYWORDS = ('street', 'avenue', 'road', 'box', 'p.o', 'po box', 'floor', 'apt', 'suite',
+                          'district', 'region', 'city', 'zip', 'postal code', 'building')
+_COMPANY_INDICATORS = ('ltd', 'inc', 'corp', 'co', 'company', 'llc', 'limited', 'enterprise',
+                       'trading', 'group', 'industries', 'services', 'solutions', 'consulting')
+_ADDRESS_INDICATORS = ('street', 'avenue', 'road', 'box', 'p.o', 'po box', 'floor', 'apt', 'suite',
+                       'district', 'region', 'city', 'country', 'zip', 'postal', 'dar', 'dar-es',
+                       'tanzania', 'nairobi', 'kenya', 'building')
+
+
+def _contains_any(text_lower: str, keywords: tuple) -> bool:
+    """Whether any of ``keywords`` occurs in ``text_lower`` (a plain loop beats any() on a genexpr)."""
+    for keyword in keywords:
+        if keyword in text_lower:
+            return True
+    return False
+
+
+def _is_likely_customer_name(text, text_lower=None):
+    """Check if text looks like a company/person name vs an address."""
+    if not text:
+        return False
+    if text_lower is None:
+        text_lower = text.lower()
+
+    # If it has strong address keywords, it's probably not a company name
+    if _contains_any(text_lower, _NAME_ADDRESS_KEYWORDS):
+        return False
+
+    # Company indicators (company names usually have these)
+    has_company_indicator = _contains_any(text_lower, _COMPANY_INDICATORS)
+
+    # Must be reasonably capitalized/formatted
+    is_well_formatted = len(text) > 2 and (text[0].isupper() or text.isupper())
+
+    # Company names should be at least 4 chars, properly capitalized, and possibly have company indicators
+    return is_well_formatted and len(text) >= 4 and (has_company_indicator or ' ' not in text or len(text.split()) <= 5)
+
+
+def _is_likely_address(text, text_lower=None):
+    """Check if text looks like an address."""
+    if not text:
+        return False
+    if text_lower is None:
+        text_lower = text.lower()
+
+    # Has location name or postal indicators
+    has_indicators = _contains_any(text_lower, _ADDRESS_INDICATORS)
+
+    # Has numbers (house/building numbers)
+    has_numbers = bool(_RE_DIGIT.search(text))
+
+    # Has multiple parts (usually separated by commas or just multiple words)
+    has_multipart = ',' in text or ' ' in text
+
+    # Address must have indicators OR have numbers and multiple parts
+    return has_indicators or (has_numbers and has_multipart and len(text) > 5)
+
+
+_EMPTY_INVOICE_DATA = {
+    'invoice_no': None,
+    'code_no': None,
+    'date': None,
+    'customer_name': None,
+    'address': None,
+    'phone': None,
+    'email': None,
+    'reference': None,
+    'subtotal': None,
+    'tax': None,
+    'total': None,
+    'items': [],
+    'payment_method': None,
+    'delivery_terms': None,
+    'remarks': None,
+    'attended_by': None,
+    'kind_attention': None
+}
+
+
 def parse_invoice_data(text: str) -> dict:
     """Parse invoice data from extracted text using pattern matching.
 
@@ -128,37 +608,13 @@ def parse_invoice_data(text: str) -> dict:
     Returns:
         dict with extracted invoice data including full customer info, line items, and payment details
     """
-    if not text or not text.strip():
-        return {
-            'invoice_no': None,
-            'code_no': None,
-            'date': None,
-            'customer_name': None,
-            'address': None,
-            'phone': None,
-            'email': None,
-            'reference': None,
-            'subtotal': None,
-            'tax': None,
-            'total': None,
-            'items': [],
-            'payment_method': None,
-            'delivery_terms': None,
-            'remarks': None,
-            'attended_by': None,
-            'kind_attention': None
-        }
+    if not text or text.isspace():
+        return dict(_EMPTY_INVOICE_DATA, items=[])
 
     normalized_text = text.strip()
-    lines = normalized_text.split('\n')
 
     # Clean and normalize lines - keep all non-empty lines for better context
-    cleaned_lines = []
-    for line in lines:
-        cleaned = line.strip()
-        # Keep all meaningful lines (not just long ones)
-        if cleaned:
-            cleaned_lines.append(cleaned)
+    cleaned_lines = [line for line in map(str.strip, normalized_text.splitlines()) if line]
 
     # Detect seller block at top of document (company header) and strip it from normalized_text
     seller_name = None
@@ -174,7 +630,7 @@ def parse_invoice_data(text: str) -> dict:
         split_idx = None
         for i, l in enumerate(top_block):
             # Stop seller block when we hit typical invoice/customer markers
-            if re.search(r'Proforma|Invoice\b|PI\b|Customer\b|Bill\s*To|Date\b|Customer\s*Reference|Invoice\s*No|Code', l, re.I):
+            if _RE_SELLER_BLOCK_END.search(l):
                 split_idx = i
                 break
         if split_idx is None:
@@ -189,30 +645,30 @@ def parse_invoice_data(text: str) -> dict:
 
             # Try to extract phone and email and tax numbers from seller_lines block
             seller_block_text = '\n'.join(seller_lines)
-            phone_match = re.search(r'(?:Tel\.?|Telephone|Phone)[:\s]*([\+\d][\d\s\-/\(\)\,]{4,}\d)', seller_block_text, re.I)
+            phone_match = _RE_SELLER_PHONE.search(seller_block_text)
             if phone_match:
                 seller_phone = phone_match.group(1).strip()
-            email_match = re.search(r'([\w\.-]+@[\w\.-]+\.\w+)', seller_block_text)
+            email_match = _RE_EMAIL.search(seller_block_text)
             if email_match:
                 seller_email = email_match.group(1).strip()
-            tax_match = re.search(r'(?:Tax\s*ID|Tax\s*No\.?|Tax\s*Number)[:\s]*([A-Z0-9\-\/]*)', seller_block_text, re.I)
+            tax_match = _RE_SELLER_TAX_ID.search(seller_block_text)
             if tax_match:
                 seller_tax_id = tax_match.group(1).strip()
-            vat_match = re.search(r'(?:VAT\s*Reg\.?|VAT\s*No\.?|VAT)[:\s]*([A-Z0-9\-\/]*)', seller_block_text, re.I)
+            vat_match = _RE_SELLER_VAT_REG.search(seller_block_text)
             if vat_match:
                 seller_vat_reg = vat_match.group(1).strip()
 
             # Remove seller block from normalized_text so subsequent extraction focuses on invoice content
-            try:
-                normalized_text = normalized_text.replace(seller_block_text, '', 1)
-                # Rebuild lines after removal
-                lines = normalized_text.split('\n')
-            except Exception:
-                pass
+            normalized_text = normalized_text.replace(seller_block_text, '', 1)
     except Exception:
         # If detection fails, continue without stripping
         seller_name = seller_name or None
 
+    # normalized_text is final from here on; split and lower-case it once for every
+    # line-based lookup and label pre-check below
+    text_lines = normalized_text.split('\n')
+    lowered_text = normalized_text.lower()
+
     # Helper to find field value - try multiple strategies including searching ahead
     def extract_field_value(label_patterns, text_to_search=None, max_distance=10, stop_at_patterns=None):
         """Extract value after a label using flexible pattern matching and distance-based search.
@@ -229,31 +685,45 @@ def parse_invoice_data(text: str) -> dict:
         search_text = text_to_search or normalized_text
         patterns = label_patterns if isinstance(label_patterns, list) else [label_patterns]
         stop_patterns = stop_at_patterns or r'Tel|Fax|Del|Ref|Date|Kind|Attended|Type|Payment|Delivery|Reference|PI|Cust|Qty|Rate|Value|Address|Customer|Code'
+        stop_word_re, stop_label_re = _stop_label_patterns(stop_patterns)
+        if search_text is normalized_text:
+            lines, lowered_search = text_lines, lowered_text
+        else:
+            lines, lowered_search = search_text.split('\n'), search_text.lower()
 
         for pattern in patterns:
+            # Every strategy below needs the label somewhere in the text; a substring
+            # check on its literal word, then one scan, rule out absent labels before
+            # the per-strategy and per-line searches
+            literal = _label_literal(pattern)
+            if literal and literal not in lowered_search:
+                continue
+            label_re, same_line_re, spaced_re, line_value_re = _field_label_patterns(pattern)
+            if not label_re.search(search_text):
+                continue
+
             # Strategy 1: Look for "Label: Value" or "Label = Value" on same line
-            m = re.search(rf'{pattern}\s*[:=]\s*([^\n:{{]+)', search_text, re.I | re.MULTILINE)
+            m = same_line_re.search(search_text)
             if m and m.group(1).strip():
                 value = m.group(1).strip()
                 # Don't clean up if it's a multi-word value (company names, addresses)
                 # Only clean if the value starts with a stop pattern
-                if not re.match(r'^(?:' + '|'.join([p for p in stop_patterns.split('|') if p.strip()]) + r')\b', value, re.I):
+                if not stop_word_re.match(value):
                     return value
 
             # Strategy 2: "Label Value" (space separated, often in scrambled PDFs)
-            m = re.search(rf'{pattern}\s+(?![:=])([A-Z][^\n:{{]*?)(?=\n[A-Z]|\s{2,}[A-Z]|\n$|$)', search_text, re.I | re.MULTILINE)
+            m = spaced_re.search(search_text)
             if m and m.group(1).strip():
                 value = m.group(1).strip()
                 # Skip if it looks like a label
-                if not re.match(r'^(?:' + '|'.join([p for p in stop_patterns.split('|') if p.strip()]) + r')\b', value, re.I) and len(value) > 2:
+                if not stop_word_re.match(value) and len(value) > 2:
                     return value
 
             # Strategy 3: Find label in a line, then look for value on next non-empty line
-            lines = search_text.split('\n')
             for i, line in enumerate(lines):
-                if re.search(pattern, line, re.I):
+                if label_re.search(line):
                     # Check if value is on same line (after label)
-                    m = re.search(rf'{pattern}\s*[:=]?\s*(.+)$', line, re.I)
+                    m = line_value_re.search(line)
                     if m:
                         value = m.group(1).strip()
                         if value and value.upper() not in (':', '=', ''):
@@ -266,7 +736,7 @@ def parse_invoice_data(text: str) -> dict:
                             continue
 
                         # Stop if it's a clear new label
-                        if re.match(r'^(?:' + '|'.join([p for p in stop_patterns.split('|') if p.strip()]) + r')\s*[:=]', next_line, re.I):
+                        if stop_label_re.match(next_line):
                             break
 
                         # This line is likely the value
@@ -281,77 +751,27 @@ def parse_invoice_data(text: str) -> dict:
         r'Code(?:\s|:)'
     ])
 
-    # Helper to validate if text looks like a customer name vs address
-    def is_likely_customer_name(text):
-        """Check if text looks like a company/person name vs an address."""
-        if not text:
-            return False
-        text_lower = text.lower()
-
-        # Strong address indicators
-        address_keywords = ['street', 'avenue', 'road', 'box', 'p.o', 'po box', 'floor', 'apt', 'suite',
-                           'district', 'region', 'city', 'zip', 'postal code', 'building']
-
-        # If it has strong address keywords, it's probably not a company name
-        for kw in address_keywords:
-            if kw in text_lower:
-                return False
-
-        # Company indicators (company names usually have these)
-        company_indicators = ['ltd', 'inc', 'corp', 'co', 'company', 'llc', 'limited', 'enterprise',
-                            'trading', 'group', 'industries', 'services', 'solutions', 'consulting']
-        has_company_indicator = any(ind in text_lower for ind in company_indicators)
-
-        # Must be reasonably capitalized/formatted
-        is_well_formatted = len(text) > 2 and (text[0].isupper() or text.isupper())
-
-        # Company names should be at least 4 chars, properly capitalized, and possibly have company indicators
-        return is_well_formatted and len(text) >= 4 and (has_company_indicator or ' ' not in text or len(text.split()) <= 5)
-
-    def is_likely_address(text):
-        """Check if text looks like an address."""
-        if not text:
-            return False
-        text_lower = text.lower()
-
-        # Strong address indicators
-        address_indicators = ['street', 'avenue', 'road', 'box', 'p.o', 'po box', 'floor', 'apt', 'suite',
-                             'district', 'region', 'city', 'country', 'zip', 'postal', 'dar', 'dar-es',
-                             'tanzania', 'nairobi', 'kenya', 'building']
-
-        # Has location name or postal indicators
-        has_indicators = any(ind in text_lower for ind in address_indicators)
-
-        # Has numbers (house/building numbers)
-        has_numbers = bool(re.search(r'\d+', text))
-
-        # Has multiple parts (usually separated by commas or just multiple words)
-        has_multipart = ',' in text or ' ' in text
-
-        # Address must have indicators OR have numbers and multiple parts
-        return has_indicators or (has_numbers and has_multipart and len(text) > 5)
-
     # Extract customer name - improved pattern matching for Superdoll format
     customer_name = None
 
     # Strategy 1: Look for "Customer Name" label and extract ONLY what comes after it
     # The key is to extract ONLY the customer name, not the label itself
     # Handle formats like: "Customer Name : VALUE" or "Customer Name VALUE"
-    m = re.search(r'Customer\s+Name\s*[:=]?\s*([A-Z][^\n]*?)(?=\n|$)', normalized_text, re.I | re.MULTILINE)
+    m = _RE_CUSTOMER_NAME_VALUE.search(normalized_text)
     if m:
         customer_name = m.group(1).strip()
 
         # Remove "Customer Name" or "Customer" if it appears at the beginning or end (due to scrambled OCR)
-        customer_name = re.sub(r'^Customer\s*Name?\s*[:=]?\s*', '', customer_name, flags=re.I).strip()
-        customer_name = re.sub(r'\s+Customer\s*Name?.*$', '', customer_name, flags=re.I).strip()
+        customer_name = _RE_CUSTOMER_LABEL_PREFIX.sub('', customer_name).strip()
+        customer_name = _RE_CUSTOMER_LABEL_SUFFIX.sub('', customer_name).strip()
 
         # Remove other field labels that might have been included at the end
-        customer_name = re.sub(r'\s+(?:Reference|Ref\.?|Address|Tel|Phone|Fax|Email|Attended|Kind|Code|PI|Date|Cust|Del\.|Type|Qty|Rate|Value)\b.*$', '', customer_name, flags=re.I).strip()
+        customer_name = _RE_CUSTOMER_TRAILING_LABELS.sub('', customer_name).strip()
 
         # Validate: customer name should have company indicators or be reasonably formatted
         if customer_name and len(customer_name) > 3 and customer_name.upper() not in ['REFERENCE', 'ADDRESS', 'TEL', 'FAX', 'EMAIL']:
             # Must not be a field label
-            if not re.match(r'^(?:Address|Tel|Fax|Email|Phone|Reference)\b', customer_name, re.I):
+            if not _RE_CONTACT_LABEL_START.match(customer_name):
                 pass
             else:
                 customer_name = None
@@ -359,17 +779,22 @@ def parse_invoice_data(text: str) -> dict:
             customer_name = None
 
     # Strategy 2: Look for lines that have customer name pattern - company names usually have LTD, CO, INC, etc.
-    if not customer_name:
-        lines_data = normalized_text.split('\n')
-        for i, line in enumerate(lines_data):
-            if re.search(r'Customer\s*Name\s*:?', line, re.I):
+    # A single search over the whole text skips the per-line scan when there is no label at all,
+    # and no line before the first whole-text hit can match on its own
+    label_match = None if customer_name else _RE_CUSTOMER_NAME_LABEL.search(normalized_text)
+    if label_match:
+        lines_data = text_lines
+        first_line = normalized_text.count('\n', 0, label_match.start())
+        for i in range(first_line, len(lines_data)):
+            line = lines_data[i]
+            if _RE_CUSTOMER_NAME_LABEL.search(line):
                 # The customer name is in this line or the next few lines
                 for j in range(i, min(i + 4, len(lines_data))):
                     candidate = lines_data[j].strip()
                     # Skip the label itself
-                    candidate = re.sub(r'^Customer\s*Name\s*:?\s*', '', candidate, flags=re.I).strip()
+                    candidate = _RE_CUSTOMER_NAME_PREFIX.sub('', candidate).strip()
                     # Check if it looks like a customer name (has company indicators or multiple words)
-                    if candidate and is_likely_customer_name(candidate) and len(candidate) > 3:
+                    if candidate and _is_likely_customer_name(candidate) and len(candidate) > 3:
                         customer_name = candidate
                         break
                 if customer_name:
@@ -385,7 +810,9 @@ def parse_invoice_data(text: str) -> dict:
 
     # Validate customer name - if it looks like an address, clear it and we'll get it from Address field
     if customer_name:
-        if is_likely_address(customer_name) and not is_likely_customer_name(customer_name):
+        customer_name_lower = customer_name.lower()
+        if (_is_likely_address(customer_name, customer_name_lower)
+                and not _is_likely_customer_name(customer_name, customer_name_lower)):
             # This looks like an address, not a customer name
             customer_name = None
         elif len(customer_name) > 200:
@@ -395,9 +822,8 @@ def parse_invoice_data(text: str) -> dict:
     # Extract address - specifically look for P.O.BOX format
     address = None
 
-    # Split text into lines for easier processing (don't filter empty - preserve structure)
-    lines = [line.strip() for line in normalized_text.split('\n')]
-    lines = [l for l in lines if l]  # Now filter empty lines
+    # Stripped, non-empty lines shared by the address, TIN and item scans below
+    lines = [line for line in map(str.strip, text_lines) if line]
 
     # Pattern 1: Find P.O.BOX with the box number - handle various formats
     pob_match = None
@@ -406,9 +832,9 @@ def parse_invoice_data(text: str) -> dict:
 
     for idx, line in enumerate(lines):
         # Match P.O.BOX or P O BOX or POB patterns
-        if re.search(r'P\.?\s*O\.?\s*B|P\.?O\.?\s*BOX|POB|P\.O', line, re.I):
+        if _RE_POBOX.search(line):
             # Try to extract the box number
-            box_match = re.search(r'(?:P\.?\s*O\.?\s*B|P\.?O\.?\s*BOX|POB|P\.O).*?(\d{3,})', line, re.I)
+            box_match = _RE_POBOX_NUMBER.search(line)
             if box_match:
                 pob_number = box_match.group(1)
                 pob_line_idx = idx
@@ -424,15 +850,15 @@ def parse_invoice_data(text: str) -> dict:
                     if not next_line:
                         continue
 
-                    if re.match(r'^(?:Tel|Fax|Attended|Kind|Reference|PI|Code|Type|Date|Email|Phone|Del|Customer|Cust|Ref|Invoice|Proforma)', next_line, re.I):
+                    if _RE_POBOX_STOP_LABELS.match(next_line):
                         break
 
                     # Keep location lines - cities, countries, postal codes
-                    if re.search(r'\b(DAR|DAR-ES-SALAAM|SALAAM|NAIROBI|KAMPALA|KIGALI|MOMBASA|MOSHI|ARUSHA|DODOMA)\b', next_line, re.I):
+                    if _RE_POBOX_CITY.search(next_line):
                         address_parts.append(next_line)
-                    elif re.search(r'\b(TANZANIA|KENYA|UGANDA|RWANDA|BURUNDI|CONGO|MALAWI|ZAMBIA)\b', next_line, re.I):
+                    elif _RE_COUNTRY.search(next_line):
                         address_parts.append(next_line)
-                    elif len(next_line) > 2 and (next_line.isupper() or re.match(r'^[A-Z][A-Z\s\-\.,]*$', next_line)):
+                    elif len(next_line) > 2 and (next_line.isupper() or _RE_UPPERCASE_LINE.match(next_line)):
                         # Likely an address line (all caps or title case)
                         address_parts.append(next_line)
                     elif len(next_line) < 3:  # Very short, might be separator
@@ -450,11 +876,11 @@ def parse_invoice_data(text: str) -> dict:
     if not address:
         for idx, line in enumerate(lines):
             # Look for "Address:" or "Address" at end of line
-            if re.search(r'\bAddress\s*[:=]?\s*$', line, re.I) or re.search(r'\bAddress\s*[:=]\s*([^\n]+)', line, re.I):
+            if _RE_ADDRESS_LABEL_END.search(line) or _RE_ADDRESS_LABEL_VALUE.search(line):
                 address_parts = []
 
                 # Check if there's content after "Address:" on the same line
-                match = re.search(r'\bAddress\s*[:=]\s*([^\n]+)', line, re.I)
+                match = _RE_ADDRESS_LABEL_VALUE.search(line)
                 if match and match.group(1).strip():
                     address_parts.append(match.group(1).strip())
 
@@ -466,7 +892,7 @@ def parse_invoice_data(text: str) -> dict:
                     if not next_line:
                         break
 
-                    if re.match(r'^(?:Tel|Fax|Attended|Kind|Reference|PI|Code|Type|Date|Email|Phone|Del|Customer|Cust|Remarks|Payment|Delivery|Ref|Invoice|Proforma)', next_line, re.I):
+                    if _RE_ADDRESS_STOP_LABELS.match(next_line):
                         break
 
                     # Add address lines
@@ -481,7 +907,7 @@ def parse_invoice_data(text: str) -> dict:
         if not address:
             for idx, line in enumerate(lines):
                 # Look for major city names (common in East Africa)
-                if re.search(r'\b(DAR|DAR-ES-SALAAM|NAIROBI|KAMPALA|KIGALI|MOMBASA|MOSHI|ARUSHA|DODOMA)\b', line, re.I):
+                if _RE_CITY.search(line):
                     address_parts = [line]
 
                     # Check next line(s) for country or additional address
@@ -489,14 +915,14 @@ def parse_invoice_data(text: str) -> dict:
                         next_line = lines[j].strip()
 
                         # Stop at empty or label lines
-                        if not next_line or re.match(r'^(?:Tel|Fax|Email|Phone|Address|Reference|Code|Type|Date|Attended|Kind|Cust|Ref)', next_line, re.I):
+                        if not next_line or _RE_CITY_STOP_LABELS.match(next_line):
                             break
 
                         # Include country or address lines
-                        if re.search(r'\b(TANZANIA|KENYA|UGANDA|RWANDA|BURUNDI|CONGO|MALAWI|ZAMBIA)\b', next_line, re.I):
+                        if _RE_COUNTRY.search(next_line):
                             address_parts.append(next_line)
                             break
-                        elif len(next_line) > 2 and (next_line.isupper() or re.search(r'\d', next_line)):
+                        elif len(next_line) > 2 and (next_line.isupper() or _RE_DIGIT.search(next_line)):
                             # Address line or postal code
                             address_parts.append(next_line)
                         else:
@@ -513,10 +939,13 @@ def parse_invoice_data(text: str) -> dict:
         first_line = address.split('\n')[0] if '\n' in address else address.split()[0:3]
         potential_name = ' '.join(first_line) if isinstance(first_line, list) else first_line
 
-        if is_likely_customer_name(potential_name):
+        if _is_likely_customer_name(potential_name):
             customer_name = potential_name
-            # Remove the name part from address
-            address = re.sub(r'^' + re.escape(potential_name) + r'\s*', '', address).strip()
+            # Remove the name part from address; a plain prefix test avoids compiling
+            # a one-off pattern built from the name
+            if address.startswith(potential_name):
+                address = address[len(potential_name):]
+            address = address.strip()
             if not address or len(address) < 3:
                 address = None
 
@@ -526,23 +955,23 @@ def parse_invoice_data(text: str) -> dict:
     # Use the same lines array as address extraction for consistency
     for idx, line in enumerate(lines):
         # Look for "Tel" on a line (with optional colon/equals)
-        if re.search(r'\bTel\b', line, re.I):
+        if _RE_TEL_LABEL.search(line):
             # Extract what comes after "Tel"
             # Try multiple patterns to be flexible
-            tel_match = re.search(r'\bTel\s*[:=]?\s*([^\n]+?)(?:\s*(?:Fax|Email|Del|Attended|Kind|Reference)|$)', line, re.I)
+            tel_match = _RE_TEL_VALUE.search(line)
             if tel_match:
                 phone_candidate = tel_match.group(1).strip()
 
                 # Clean up: remove trailing field labels
-                phone_candidate = re.sub(r'\s+(?:Fax|Email|Del|Attended|Kind|Reference)\s*.*$', '', phone_candidate, flags=re.I).strip()
+                phone_candidate = _RE_PHONE_TRAILING_LABELS.sub('', phone_candidate).strip()
 
                 # Must have some actual content
                 if phone_candidate and len(phone_candidate) > 1:
                     # Remove leading/trailing non-alphanumeric except for +, -, /, spaces, ()
-                    phone_candidate = re.sub(r'^[^\w\+\-\(]|[^\w\)]$', '', phone_candidate).strip()
+                    phone_candidate = _RE_PHONE_EDGE_NOISE.sub('', phone_candidate).strip()
 
                     # Accept if it has digits or is long enough to be a phone
-                    if re.search(r'\d', phone_candidate) and len(phone_candidate) > 2:
+                    if _RE_DIGIT.search(phone_candidate) and len(phone_candidate) > 2:
                         phone = phone_candidate
                         break
 
@@ -551,9 +980,9 @@ def parse_invoice_data(text: str) -> dict:
         try:
             candidate_lines = []
             for ln in lines:
-                if re.search(r'\d{3,}\s*[/\-]\s*\d{3,}', ln):
+                if _RE_PHONE_PAIR.search(ln):
                     # Exclude typical non-phone rows
-                    if re.search(r'PI\b|Invoice|Gross|Net|VAT|TSH|Qty|Rate|Value|Code|Sr\b|No\.', ln, re.I):
+                    if _RE_NON_PHONE_ROW.search(ln):
                         continue
                     candidate_lines.append(ln.strip())
             if candidate_lines:
@@ -564,31 +993,29 @@ def parse_invoice_data(text: str) -> dict:
 
     # Extract email - look for email pattern in the text
     email = None
-    email_match = re.search(r'([\w\.-]+@[\w\.-]+\.\w+)', normalized_text)
+    email_match = _RE_EMAIL.search(normalized_text)
     if email_match:
         email = email_match.group(1)
 
     # Extract reference - more careful pattern to avoid getting other labels
     reference = None
-    ref_pattern = re.compile(r'(?:Reference|Ref\.?)\s*[:=]?\s*([^\n:{{]+?)(?=\n(?:Tel|Code|PI|Date|Del\.|Attended|Kind|Remarks)\b|$)', re.I | re.MULTILINE)
-    ref_match = ref_pattern.search(normalized_text)
+    ref_match = _RE_REFERENCE.search(normalized_text)
 
     if ref_match:
         reference = ref_match.group(1).strip()
         # Clean up
-        reference = re.sub(r'\s+(?:Tel|Fax|Date|PI|Code)\b.*$', '', reference, flags=re.I).strip()
+        reference = _RE_REFERENCE_TRAILING.sub('', reference).strip()
         if not reference or reference.upper() == 'NONE' or len(reference) < 2:
             reference = None
 
     # Extract PI No. / Invoice Number - specifically handle "PI No." format
     invoice_no = None
-    pi_pattern = re.compile(r'PI\s*(?:No|Number|#)\s*[:=]?\s*([^\n:{{]+?)(?=\n|$)', re.I | re.MULTILINE)
-    pi_match = pi_pattern.search(normalized_text)
+    pi_match = _RE_PI_NO.search(normalized_text)
 
     if pi_match:
         invoice_no = pi_match.group(1).strip()
         # Clean up trailing whitespace and field names
-        invoice_no = re.sub(r'\s+(?:Date|Cust|Ref|Del|Code)\b.*$', '', invoice_no, flags=re.I).strip()
+        invoice_no = _RE_PI_TRAILING.sub('', invoice_no).strip()
 
     # Fallback to "Invoice Number" pattern if PI No not found
     if not invoice_no:
@@ -600,72 +1027,58 @@ def parse_invoice_data(text: str) -> dict:
     # Extract Date (multiple formats)
     date_str = None
     # Look for date patterns - prioritize those near labels
-    date_patterns = [
-        (r'(?:Invoice\s*)?Date\s*[:=]?\s*(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})', True),  # "Date: DD/MM/YYYY"
-        (r'(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4})', False),  # Any date pattern (fallback)
-    ]
-
-    for pattern, is_priority in date_patterns:
-        m = re.search(pattern, normalized_text, re.I)
+    for pattern, is_priority in _DATE_PATTERNS:
+        m = pattern.search(normalized_text)
         if m:
             date_str = m.group(1)
             if is_priority:
                 break
 
-    # Parse monetary values helper
-    def to_decimal(s):
-        try:
-            if s:
-                # Remove currency symbols and extra characters, keep only numbers, dot, comma
-                cleaned = re.sub(r'[^\d\.\,\-]', '', str(s)).strip()
-                if cleaned and cleaned not in ('.', ',', '-'):
-                    return Decimal(cleaned.replace(',', ''))
-        except Exception:
-            pass
-        return None
-
     # Extract monetary amounts using flexible patterns (handles scrambled PDFs)
     def find_amount(label_patterns):
         """Find monetary amount after label patterns - works with scrambled PDF text"""
         patterns = (label_patterns if isinstance(label_patterns, list) else [label_patterns])
         for pattern in patterns:
+            # No label word in the text means none of the amount patterns can match
+            literal = _label_literal(pattern)
+            if literal and literal not in lowered_text:
+                continue
+            label_re, colon_re, equals_re, spaced_re, line_amount_re = _amount_label_patterns(pattern)
             # Try with colon separator: "Label: Amount"
-            m = re.search(rf'{pattern}\s*:\s*(?:TSH|TZS|UGX)?\s*([0-9\,\.]+)', normalized_text, re.I | re.MULTILINE)
+            m = colon_re.search(normalized_text)
             if m:
                 return m.group(1)
 
             # Try with equals: "Label = Amount"
-            m = re.search(rf'{pattern}\s*=\s*(?:TSH|TZS|UGX)?\s*([0-9\,\.]+)', normalized_text, re.I | re.MULTILINE)
+            m = equals_re.search(normalized_text)
             if m:
                 return m.group(1)
 
             # Try with space and optional currency on same line
-            m = re.search(rf'{pattern}\s+(?:TSH|TZS|UGX)?\s*([0-9\,\.]+)', normalized_text, re.I | re.MULTILINE)
+            m = spaced_re.search(normalized_text)
             if m:
                 return m.group(1)
 
             # Try finding amount on next line (for scrambled PDFs)
-            lines = normalized_text.split('\n')
-            for i, line in enumerate(lines):
-                if re.search(pattern, line, re.I):
+            for i, line in enumerate(text_lines):
+                if label_re.search(line):
                     # Check for amount on same line
-                    m = re.search(rf'{pattern}\s*[:=]?\s*([0-9\,\.]+)', line, re.I)
+                    m = line_amount_re.search(line)
                     if m:
                         return m.group(1)
 
                     # Check next 2 lines for amount
                     for j in range(1, 3):
-                        if i + j < len(lines):
-                            next_line = lines[i + j].strip()
+                        if i + j < len(text_lines):
+                            next_line = text_lines[i + j].strip()
                             # Look for amount pattern
-                            if re.match(r'^(?:TSH|TZS|UGX)?\s*([0-9\,\.]+)', next_line, re.I):
-                                m = re.match(r'^(?:TSH|TZS|UGX)?\s*([0-9\,\.]+)', next_line, re.I)
-                                if m:
-                                    return m.group(1)
+                            m = _RE_LEADING_AMOUNT.match(next_line)
+                            if m:
+                                return m.group(1)
         return None
 
     # Extract Net Value / Subtotal
-    subtotal = to_decimal(find_amount([
+    subtotal = _to_decimal(find_amount([
         r'Net\s*Value',
         r'Net\s*Amount',
         r'Subtotal',
@@ -673,7 +1086,7 @@ def parse_invoice_data(text: str) -> dict:
     ]))
 
     # Extract VAT / Tax
-    tax = to_decimal(find_amount([
+    tax = _to_decimal(find_amount([
         r'VAT',
         r'Tax',
         r'GST',
@@ -682,8 +1095,7 @@ def parse_invoice_data(text: str) -> dict:
 
     # Extract Tax Rate (percentage) - look for patterns like "18.00%" or "18%"
     tax_rate = None
-    tax_rate_pattern = re.compile(r'VAT.*?(\d+(?:\.\d+)?)\s*%|Tax\s*Rate.*?(\d+(?:\.\d+)?)\s*%', re.I)
-    tax_rate_match = tax_rate_pattern.search(normalized_text)
+    tax_rate_match = _RE_TAX_RATE.search(normalized_text)
     if tax_rate_match:
         rate_str = tax_rate_match.group(1) or tax_rate_match.group(2)
         try:
@@ -699,7 +1111,7 @@ def parse_invoice_data(text: str) -> dict:
             tax_rate = None
 
     # Gross Value / Total
-    total = to_decimal(find_amount([
+    total = _to_decimal(find_amount([
         r'Gross\s*Value',
         r'Total\s*Amount',
         r'Grand\s*Total',
@@ -708,13 +1120,12 @@ def parse_invoice_data(text: str) -> dict:
 
     # Extract payment method - careful pattern to extract payment terms
     payment_method = None
-    payment_pattern = re.compile(r'(?:Payment|Payment\s*Method|Payment\s*Type)\s*[:=]?\s*([^\n:{{]+?)(?=\n|$)', re.I | re.MULTILINE)
-    payment_match = payment_pattern.search(normalized_text)
+    payment_match = _RE_PAYMENT.search(normalized_text)
 
     if payment_match:
         payment_method = payment_match.group(1).strip()
         # Clean up
-        payment_method = re.sub(r'\s+(?:Delivery|Remarks|Net|Gross|Due|NOTE)\b.*$', '', payment_method, flags=re.I).strip()
+        payment_method = _RE_PAYMENT_TRAILING.sub('', payment_method).strip()
 
         if payment_method and len(payment_method) > 1:
             # Normalize the payment method
@@ -746,221 +1157,52 @@ def parse_invoice_data(text: str) -> dict:
 
     # Extract delivery terms - improved pattern
     delivery_terms = None
-    delivery_pattern = re.compile(r'(?:Delivery|Delivery\s*Terms)\s*[:=]?\s*([^\n:{{]+?)(?=\n|$)', re.I | re.MULTILINE)
-    delivery_match = delivery_pattern.search(normalized_text)
+    delivery_match = _RE_DELIVERY.search(normalized_text)
 
     if delivery_match:
         delivery_terms = delivery_match.group(1).strip()
         # Clean up
-        delivery_terms = re.sub(r'\s+(?:Remarks|Notes|NOTE|Net|Gross|Payment)\b.*$', '', delivery_terms, flags=re.I).strip()
+        delivery_terms = _RE_DELIVERY_TRAILING.sub('', delivery_terms).strip()
         if not delivery_terms or len(delivery_terms) < 2:
             delivery_terms = None
 
     # Extract remarks/notes - improved pattern
     remarks = None
-    remarks_pattern = re.compile(r'(?:Remarks|Notes|NOTE)\s*[:=]?\s*(.+?)(?=\n(?:Payment|Delivery|Net|Gross|NOTE|Authorized|Qty|Code)\b|$)', re.I | re.MULTILINE | re.DOTALL)
-    remarks_match = remarks_pattern.search(normalized_text)
+    remarks_match = _RE_REMARKS.search(normalized_text)
 
     if remarks_match:
         remarks = remarks_match.group(1).strip()
         # Clean up - remove extra spaces, newlines, and trailing labels
         remarks = ' '.join(remarks.split())
-        remarks = re.sub(r'(?:\d+\s*:|^NOTE\s*\d+\s*:)', '', remarks, flags=re.I).strip()
-        remarks = re.sub(r'(?:Payment|Delivery|Due|See|Qty|Code|SR)\b.*$', '', remarks, flags=re.I).strip()
+        remarks = _RE_REMARKS_NOTE_NUMBER.sub('', remarks).strip()
+        remarks = _RE_REMARKS_TRAILING.sub('', remarks).strip()
         if not remarks or len(remarks) < 2:
             remarks = None
 
     # Extract "Attended By" field - more careful pattern matching
     attended_by = None
-    attended_pattern = re.compile(r'Attended\s*(?:By|:)?\s*([^\n:{{]+?)(?=\n(?:Kind|Reference|Tel|Remarks|Payment)\b|$)', re.I | re.MULTILINE)
-    attended_match = attended_pattern.search(normalized_text)
+    attended_match = _RE_ATTENDED_BY.search(normalized_text)
 
     if attended_match:
         attended_by = attended_match.group(1).strip()
         # Clean up
-        attended_by = re.sub(r'\s+(?:Kind|Reference|Tel|Remarks|Payment)\b.*$', '', attended_by, flags=re.I).strip()
+        attended_by = _RE_ATTENDED_BY_TRAILING.sub('', attended_by).strip()
         if not attended_by or len(attended_by) < 2:
             attended_by = None
 
     # Extract "Kind Attention" field - handles both "Kind Attention" and "Kind Attn"
     kind_attention = None
-    kind_pattern = re.compile(r'Kind\s*(?:Attention|Attn|:)?\s*([^\n:{{]+?)(?=\n(?:Reference|Remarks|Tel|Attended|Payment|Delivery)\b|$)', re.I | re.MULTILINE)
-    kind_match = kind_pattern.search(normalized_text)
+    kind_match = _RE_KIND_ATTENTION.search(normalized_text)
 
     if kind_match:
         kind_attention = kind_match.group(1).strip()
         # Clean up
-        kind_attention = re.sub(r'\s+(?:Reference|Remarks|Tel|Attended|Payment|Delivery)\b.*$', '', kind_attention, flags=re.I).strip()
+        kind_attention = _RE_KIND_ATTENTION_TRAILING.sub('', kind_attention).strip()
         if not kind_attention or len(kind_attention) < 2:
             kind_attention = None
 
     # Extract line items with improved detection for various table formats
-    # Strategy: Group lines by item (main description line followed by continuation lines)
-    # Then parse structured data from each item group
-    items = []
-    item_section_started = False
-    item_header_idx = -1
-
-    # Collect all lines to process
-    line_data = []
-    for idx, line in enumerate(lines):
-        line_stripped = line.strip()
-        if not line_stripped:
-            continue
-        line_data.append((idx, line_stripped))
-
-    # Find header section
-    for list_idx, (idx, line_stripped) in enumerate(line_data):
-        # Detect item section header - line with multiple item-related keywords
-        keyword_count = sum([
-            1 if re.search(r'\b(?:Sr|S\.N|Serial|No\.?)\b', line_stripped, re.I) else 0,
-            1 if re.search(r'\b(?:Item|Code)\b', line_stripped, re.I) else 0,
-            1 if re.search(r'\b(?:Description|Desc)\b', line_stripped, re.I) else 0,
-            1 if re.search(r'\b(?:Qty|Quantity|Qty\.?|Type)\b', line_stripped, re.I) else 0,
-            1 if re.search(r'\b(?:Rate|Price|Unit|UnitPrice)\b', line_stripped, re.I) else 0,
-            1 if re.search(r'\b(?:Value|Amount|Total)\b', line_stripped, re.I) else 0,
-        ])
-
-        if keyword_count >= 3:
-            item_section_started = True
-            item_header_idx = list_idx
-            continue
-
-        # Stop at totals/summary section
-        if item_section_started and list_idx > item_header_idx + 1:
-            if re.search(r'(?:Net\s*Value|Gross\s*Value|Grand\s*Total|Total\s*:|Payment|Delivery|Remarks|NOTE)', line_stripped, re.I):
-                break
-
-        # Parse item lines (after header starts)
-        if item_section_started and list_idx > item_header_idx:
-            if not line_stripped:
-                continue
-
-            # Extract all numbers from the line
-            numbers = re.findall(r'[0-9\,]+\.?\d*', line_stripped)
-            float_numbers = []
-            if numbers:
-                for n in numbers:
-                    try:
-                        cleaned = n.replace(',', '').strip()
-                        if cleaned and cleaned != '.' and cleaned != '':
-                            float_numbers.append(float(cleaned))
-                    except (ValueError, AttributeError):
-                        # Skip numbers that can't be converted
-                        continue
-
-            # Detect unit/type indicators (PCS, NOS, UNT, HR, KG, etc.)
-            unit_match = re.search(r'\b(NOS|PCS|KG|HR|LTR|PIECES?|UNITS?|BOX|CASE|SETS?|PC|KIT|UNT)\b', line_stripped, re.I)
-            unit_value = unit_match.group(1).upper() if unit_match else None
-
-            # Check if this line is likely a main item row (Sr No, Code, Description, amounts)
-            # It should have: some text (description) and numbers (qty, rate, value)
-            is_likely_item_row = len(line_stripped) > 5 and numbers and re.search(r'[A-Za-z]', line_stripped)
-
-            # Skip if this appears to be a continuation line (lines that are just units or percentages)
-            is_continuation_only = (unit_value or re.match(r'^\d+(?:\.\d+)?%?\s*$', line_stripped)) and len(float_numbers) <= 2
-
-            if is_likely_item_row and not is_continuation_only:
-                try:
-                    # Extract item code - typically appears as the first numeric field after Sr No
-                    item_code = None
-                    description_text = line_stripped
-
-                    # Item codes can be 3-10 digits (examples: 21004, 21019, 2132004135, 3373119002)
-                    # They typically appear after the Sr No and before the description
-                    code_match = re.search(r'^[\s\d]*\s+(\d{3,10})\s+', line_stripped)
-                    if code_match:
-                        item_code = code_match.group(1)
-                        # Remove the Sr No and code from description for cleaner extraction
-                        description_text = re.sub(r'^\s*\d+\s+\d{3,10}\s+', '', line_stripped).strip()
-                    else:
-                        # Fallback: find first numeric value that looks like a code
-                        # This handles cases where spacing is different
-                        first_code_match = re.search(r'\b(\d{3,10})\b', line_stripped)
-                        if first_code_match:
-                            item_code = first_code_match.group(1)
-
-                    # Extract description (text portion, typically before large numeric values like rates/amounts)
-                    # Look for the last sequence of letters/words before significant numbers
-                    full_description = ''
-                    words = description_text.split()
-                    for i, word in enumerate(words):
-                        # Stop when we hit a large number (amounts typically > 1000 or have comma/decimal)
-                        if re.match(r'^\d+[\,\.]\d+', word) or (len(word) > 8 and re.match(r'^\d+', word)):
-                            # Stop here - everything before is description
-                            full_description = ' '.join(words[:i]).strip()
-                            break
-                        # Also check for unit keywords which typically come after description
-                        elif re.match(r'^(PCS|NOS|KG|HR|LTR|PIECES|UNITS|KIT|BOX|CASE|SETS|PC|UNT)$', word, re.I):
-                            # Unit found - description is everything before
-                            full_description = ' '.join(words[:i]).strip()
-                            break
-
-                    # If we didn't find a stopping point, use all words with letters
-                    if not full_description:
-                        desc_words = [w for w in words if re.search(r'[A-Za-z]', w)]
-                        if desc_words:
-                            full_description = ' '.join(desc_words[:min(10, len(desc_words))]).strip()
-                        else:
-                            full_description = words[0] if words else ''
-
-                    # Clean up description
-                    full_description = re.sub(r'\s+', ' ', full_description).strip()
-                    full_description = full_description[:255]
-
-                    # Skip if no meaningful description
-                    if not full_description or len(full_description) < 2:
-                        continue
-
-                    # Parse quantities and amounts from the extracted numbers
-                    item = {
-                        'description': full_description,
-                        'qty': 1,
-                        'unit': unit_value,
-                        'value': None,
-                        'rate': None,
-                        'code': item_code,
-                    }
-
-                    # Parse numeric values based on count and patterns
-                    max_num = max(float_numbers) if float_numbers else 0
-
-                    if len(float_numbers) == 1:
-                        # Single number: the value
-                        item['value'] = to_decimal(str(float_numbers[0]))
-                    elif len(float_numbers) == 2:
-                        # Two numbers: likely qty and value
-                        if float_numbers[0] < 100 and float_numbers[0] == int(float_numbers[0]):
-                            item['qty'] = int(float_numbers[0])
-                            item['value'] = to_decimal(str(float_numbers[1]))
-                        elif float_numbers[1] < 100 and float_numbers[1] == int(float_numbers[1]):
-                            item['qty'] = int(float_numbers[1])
-                            item['value'] = to_decimal(str(float_numbers[0]))
-                        else:
-                            # Neither obvious, largest is value
-                            item['value'] = to_decimal(str(max_num))
-                    elif len(float_numbers) >= 3:
-                        # Multiple numbers: typically Sr#, Code, Qty, Rate, Value
-                        item['value'] = to_decimal(str(max_num))
-
-                        # Find quantity: small integer less than 100
-                        qty_candidate = None
-                        for fn in float_numbers:
-                            if fn == int(fn) and 0 < fn < 100 and fn != max_num:
-                                qty_candidate = int(fn)
-                                break
-
-                        if qty_candidate:
-                            item['qty'] = qty_candidate
-                            if qty_candidate > 0 and max_num > 0:
-                                item['rate'] = to_decimal(str(max_num / qty_candidate))
-
-                    # Only add if we have meaningful data
-                    if item.get('description') and (item.get('value') or item.get('qty', 1) > 1):
-                        items.append(item)
-
-                except Exception as e:
-                    logger.warning(f"Error parsing item line: {line_stripped}, {e}")
+    items = list(_iter_items(lines))
 
     return {
         'invoice_no': invoice_no,
@@ -991,7 +1233,59 @@ def parse_invoice_data(text: str) -> dict:
     }
 
 
-def extract_from_bytes(file_bytes, filename: str = '') -> dict:
+# User-facing messages for the failure results of extract_from_bytes / extract_from_upload
+_FAILURE_MESSAGES = {
+    'empty_file': 'File is empty. Please upload a valid PDF file.',
+    'image_file_not_supported': 'Image files are not supported. Please convert to PDF or enter details manually.',
+    'unsupported_file_type': 'Please upload a PDF file.',
+    'pdf_extraction_failed': 'Could not extract text from PDF. Please enter invoice details manually.',
+    'no_text_extracted': 'No readable text found in PDF (possibly a scanned image). Please enter invoice details manually.',
+    'parsing_failed': 'Could not extract structured data from PDF. Please enter invoice details manually.',
+    'read_failed': 'Failed to read uploaded file',
+}
+
+
+def _failure_result(error: str, raw_text: str = '') -> dict:
+    """Build the result dict returned when extraction does not succeed."""
+    return {
+        'success': False,
+        'error': error,
+        'message': _FAILURE_MESSAGES[error],
+        'ocr_available': False,
+        'header': {},
+        'items': [],
+        'raw_text': raw_text
+    }
+
+
+# Leading magic bytes of the image formats users upload instead of a PDF
+_IMAGE_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a', b'BM', b'II*\x00', b'MM\x00*')
+_IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.gif', '.tiff', '.bmp')
+_SUFFIX_TAIL = max(map(len, _IMAGE_SUFFIXES + ('.pdf',)))
+
+
+def _detect_file_type(file_bytes, filename: str = ''):
+    """Classify an upload as ``'pdf'``, ``'image'`` or ``None`` (unsupported).
+
+    The leading bytes are authoritative; the filename suffix is only consulted
+    when they match no known signature.
+    """
+    # bytes are checked in place; mmap/memoryview buffers lack startswith()
+    head = file_bytes if isinstance(file_bytes, bytes) else bytes(file_bytes[:12])
+    if head.startswith(b'%PDF'):
+        return 'pdf'
+    if head.startswith(_IMAGE_SIGNATURES):
+        return 'image'
+    # Only the tail can hold a suffix; lower-casing never shortens a character
+    name = filename[-_SUFFIX_TAIL:].lower()
+    if name.endswith(_IMAGE_SUFFIXES):
+        return 'image'
+    if name.endswith('.pdf'):
+        return 'pdf'
+    return None
+
+
+def extract_from_bytes(file_bytes, filename: str = '', path: str = None) -> dict:
     """Main entry point: extract text from file and parse invoice data.
 
     Supports:
@@ -999,79 +1293,45 @@ def extract_from_bytes(file_bytes, filename: str = '') -> dict:
     - Image files: Requires manual entry (OCR not available)
 
     Args:
-        file_bytes: Raw bytes of uploaded file
+        file_bytes: Raw bytes of uploaded file (any buffer supporting len() and slicing)
         filename: Original filename (to detect file type)
+        path: Optional filesystem path of the same file, passed on to the PDF readers
 
     Returns:
         dict with keys: success, header, items, raw_text, ocr_available, error, message
     """
     if not file_bytes:
-        return {
-            'success': False,
-            'error': 'empty_file',
-            'message': 'File is empty. Please upload a valid PDF file.',
-            'ocr_available': False,
-            'header': {},
-            'items': [],
-            'raw_text': ''
-        }
+        return _failure_result('empty_file')
 
     # Detect file type
-    is_pdf = filename.lower().endswith('.pdf') or file_bytes[:4] == b'%PDF'
-    is_image = filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.tiff', '.bmp'))
+    file_type = _detect_file_type(file_bytes, filename)
 
     text = ""
 
     # Validate file format
-    if is_image:
-        return {
-            'success': False,
-            'error': 'image_file_not_supported',
-            'message': 'Image files are not supported. Please convert to PDF or enter details manually.',
-            'ocr_available': False,
-            'header': {},
-            'items': [],
-            'raw_text': ''
-        }
+    if file_type == 'image':
+        return _failure_result('image_file_not_supported')
 
-    if not is_pdf:
-        return {
-            'success': False,
-            'error': 'unsupported_file_type',
-            'message': 'Please upload a PDF file.',
-            'ocr_available': False,
-            'header': {},
-            'items': [],
-            'raw_text': ''
-        }
+    if file_type != 'pdf':
+        return _failure_result('unsupported_file_type')
+
+    digest = hashlib.blake2b(file_bytes, digest_size=16).digest()
+    with _CACHE_LOCK:
+        cached = _RESULT_CACHE.get(digest)
+    if cached is not None:
+        return copy.deepcopy(cached)
 
     # Extract text from PDF
     try:
-        text = extract_text_from_pdf(file_bytes)
+        text = extract_text_from_pdf(file_bytes, path, digest)
     except Exception as e:
         logger.error(f"PDF text extraction failed: {e}")
-        return {
-            'success': False,
-            'error': 'pdf_extraction_failed',
-            'message': f'Could not extract text from PDF. Please enter invoice details manually.',
-            'ocr_available': False,
-            'header': {},
-            'items': [],
-            'raw_text': ''
-        }
+        return _failure_result('pdf_extraction_failed')
 
     # Validate that we got text
-    if not text or not text.strip():
+    if not text or text.isspace():
         logger.warning("PDF text extraction returned empty text")
-        return {
-            'success': False,
-            'error': 'no_text_extracted',
-            'message': 'No readable text found in PDF (possibly a scanned image). Please enter invoice details manually.',
-            'ocr_available': False,
-            'header': {},
-            'items': [],
-            'raw_text': ''
-        }
+        return _failure_result('no_text_extracted')
 
     # Parse extracted text to structured invoice data
     try:
@@ -1135,7 +1395,7 @@ def extract_from_bytes(file_bytes, filename: str = '') -> dict:
 
         if has_customer or has_items or has_amounts:
             logger.info(f"Successfully extracted invoice data: customer={has_customer}, items={has_items}, amounts={has_amounts}")
-            return {
+            result = {
                 'success': True,
                 'header': header,
                 'items': items,
@@ -1143,25 +1403,79 @@ def extract_from_bytes(file_bytes, filename: str = '') -> dict:
                 'ocr_available': False,
                 'message': 'Invoice data extracted successfully'
             }
+            with _CACHE_LOCK:
+                _RESULT_CACHE[digest] = result
+            return copy.deepcopy(result)
         else:
             logger.warning("PDF text extracted but no invoice data found after parsing")
-            return {
-                'success': False,
-                'error': 'parsing_failed',
-                'message': 'Could not extract structured data from PDF. Please enter invoice details manually.',
-                'ocr_available': False,
-                'header': {},
-                'items': [],
-                'raw_text': text
-            }
+            return _failure_result('parsing_failed', text)
     except Exception as e:
         logger.error(f"Invoice data parsing failed: {e}", exc_info=True)
-        return {
-            'success': False,
-            'error': 'parsing_failed',
-            'message': 'Could not extract structured data from PDF. Please enter invoice details manually.',
-            'ocr_available': False,
-            'header': {},
-            'items': [],
-            'raw_text': text
-        }
+        return _failure_result('parsing_failed', text)
+
+
+# Files below this size parse faster in-process than a worker process can start
+_BATCH_IN_PROCESS_MAX_BYTES = 64 * 1024
+
+
+def _extract_from_file(file) -> dict:
+    """Worker entry point for ``extract_from_bytes_batch``: unpack ``(file_bytes, filename)``."""
+    file_bytes, filename = file
+    return extract_from_bytes(file_bytes, filename)
+
+
+def extract_from_bytes_batch(files, max_workers: int = None) -> list:
+    """Run ``extract_from_bytes`` over several files, parsing large ones in worker processes.
+
+    Parsing holds the GIL throughout, so bulk ingestion only scales across processes.
+    Small files are handled in-process, where they finish before a worker would start.
+
+    Args:
+        files: Iterable of ``(file_bytes, filename)`` tuples
+        max_workers: Maximum number of worker processes (defaults to CPU count)
+
+    Returns:
+        List of result dicts, in the same order as ``files``
+    """
+    files = list(files)
+    remote = [idx for idx, (file_bytes, _) in enumerate(files) if len(file_bytes) >= _BATCH_IN_PROCESS_MAX_BYTES]
+    workers = min(len(remote), max_workers or os.cpu_count() or 1)
+    if workers < 2:
+        return [_extract_from_file(file) for file in files]
+
+    results = [None] * len(files)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {idx: pool.submit(_extract_from_file, files[idx]) for idx in remote}
+        # Small files are parsed here while the workers handle the large ones
+        for idx, file in enumerate(files):
+            if idx not in futures:
+                results[idx] = _extract_from_file(file)
+        for idx, future in futures.items():
+            results[idx] = future.result()
+    return results
+
+
+def extract_from_upload(uploaded) -> dict:
+    """Extract invoice data from a Django ``UploadedFile``.
+
+    Uploads Django has spooled to disk (``TemporaryUploadedFile``) are memory-mapped
+    for the file type checks and opened by path for text extraction, so large files
+    are never copied into a bytes object. In-memory uploads are read as before.
+
+    Args:
+        uploaded: Django UploadedFile from ``request.FILES``
+
+    Returns:
+        dict with the same keys as ``extract_from_bytes``
+    """
+    filename = getattr(uploaded, 'name', '') or ''
+    try:
+        if hasattr(uploaded, 'temporary_file_path') and uploaded.size:
+            path = uploaded.temporary_file_path()
+            with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return extract_from_bytes(buf, filename, path=path)
+        file_bytes = uploaded.read()
+    except OSError as e:
+        logger.error(f"Failed to read uploaded file: {e}")
+        return _failure_result('read_failed')
+    return extract_from_bytes(file_bytes, filename)
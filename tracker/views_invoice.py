@@ -11,13 +11,14 @@ from django.utils import timezone
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.views.decorators.http import require_http_methods
 from django.db import transaction
 
 from .models import Invoice, InvoiceLineItem, InvoicePayment, Order, Customer, Vehicle, InventoryItem
 from .forms import InvoiceForm, InvoiceLineItemForm, InvoicePaymentForm
 from .utils import get_user_branch
+from .utils.pdf_text_extractor import extract_from_upload
 from .services import OrderService, CustomerService, VehicleService
 
 logger = logging.getLogger(__name__)
@@ -90,7 +91,6 @@ def api_upload_extract_invoice(request):
       - Preserves extracted Net (subtotal), VAT (tax_amount) and Gross (total_amount). If no items were parsed,
         totals are kept as-is to ensure KPIs sum correctly.
     """
-    from tracker.utils.invoice_extractor import extract_from_bytes
     import traceback
 
     user_branch = get_user_branch(request.user)
@@ -100,16 +100,9 @@ def api_upload_extract_invoice(request):
     if not uploaded:
         return JsonResponse({'success': False, 'message': 'No file uploaded'})
 
+    # Run PDF text extractor (no OCR required); large uploads are read from their temp file
     try:
-        file_bytes = uploaded.read()
-    except Exception as e:
-        logger.error(f"Failed to read uploaded file: {e}")
-        return JsonResponse({'success': False, 'message': 'Failed to read uploaded file'})
-
-    # Run PDF text extractor (no OCR required)
-    try:
-        from tracker.utils.pdf_text_extractor import extract_from_bytes as extract_pdf_text
-        extracted = extract_pdf_text(file_bytes, uploaded.name if uploaded else 'document.pdf')
+        extracted = extract_from_upload(uploaded)
     except Exception as e:
         logger.error(f"PDF extraction error: {e}\n{traceback.format_exc()}")
         return JsonResponse({
@@ -153,7 +146,7 @@ def api_upload_extract_invoice(request):
     selected_order = None
     if selected_order_id:
         try:
-            selected_order = Order.objects.get(id=int(selected_order_id), branch=user_branch)
+            selected_order = Order.objects.select_related('customer').get(id=int(selected_order_id), branch=user_branch)
         except Exception as e:
             logger.warning(f"Selected order {selected_order_id} not found: {e}")
             selected_order = None
@@ -168,6 +161,7 @@ def api_upload_extract_invoice(request):
 
     # Determine customer to use
     customer_obj = None
+    vehicle = None
 
     # Priority 1: Use customer from selected order if available
     if selected_order and selected_order.customer:
@@ -178,16 +172,17 @@ def api_upload_extract_invoice(request):
         cust_name = (header.get('customer_name') or '').strip()
         cust_phone = (header.get('phone') or '').strip()
 
-        # Prefer composite identifier (name + plate) when available
+        # Prefer composite identifier (name + plate) when available; the matched vehicle
+        # comes with its customer and is reused below
         if cust_name and plate:
             try:
-                composite = CustomerService.find_customer_by_name_and_plate(
+                vehicle = CustomerService.find_vehicle_by_name_and_plate(
                     branch=user_branch,
                     full_name=cust_name,
                     plate_number=plate,
                 )
-                if composite:
-                    customer_obj = composite
+                if vehicle:
+                    customer_obj = vehicle.customer
             except Exception as e:
                 logger.warning(f"Composite name+plate lookup failed: {e}")
 
@@ -243,9 +238,8 @@ def api_upload_extract_invoice(request):
             'ocr_available': extracted.get('ocr_available', False)
         })
 
-    # Ensure vehicle if plate
-    vehicle = None
-    if plate and customer_obj:
+    # Ensure vehicle if plate (unless the composite lookup already matched it)
+    if plate and customer_obj and vehicle is None:
         try:
             vehicle = VehicleService.create_or_get_vehicle(customer=customer_obj, plate_number=plate)
         except Exception as e:
@@ -364,10 +358,10 @@ def api_upload_extract_invoice(request):
 
         # Persist uploaded document into invoice.document for traceability
         try:
-            from django.core.files.base import ContentFile
             filename = (uploaded.name if uploaded and getattr(uploaded, 'name', None) else f"invoice_{inv.invoice_number}.pdf")
-            if 'file_bytes' in locals() and file_bytes:
-                inv.document.save(filename, ContentFile(file_bytes), save=True)
+            if uploaded.size:
+                # Save from the upload itself; storage copies it in chunks
+                inv.document.save(filename, uploaded, save=True)
         except Exception:
             # Non-fatal: continue without blocking invoice creation
             pass
@@ -483,15 +477,12 @@ def api_upload_extract_invoice(request):
                     tax_amount=Decimal('0'),
                 ))
             if to_create:
-                InvoiceLineItem.objects.bulk_create(to_create)
+                InvoiceLineItem.objects.bulk_create(to_create, batch_size=100)
         except Exception as e:
             logger.warning(f"Failed to bulk create invoice line items: {e}")
 
-        # IMPORTANT: Preserve extracted Net, VAT, and Gross values for uploaded invoices
-        inv.subtotal = header.get('subtotal') or Decimal('0')
-        inv.tax_amount = header.get('tax') or Decimal('0')
-        inv.total_amount = header.get('total') or (inv.subtotal + inv.tax_amount)
-        inv.save(update_fields=['subtotal', 'tax_amount', 'total_amount'])
+        # IMPORTANT: The extracted Net, VAT and Gross values saved above are kept as the invoice
+        # totals; bulk_create skips InvoiceLineItem.save(), so nothing recalculates them
 
         # Create payment record for tracking
         if inv.total_amount and inv.total_amount > 0:
@@ -975,8 +966,8 @@ def invoice_document_download(request, pk):
         return redirect('tracker:invoice_detail', pk=pk)
 
     try:
-        # Open the file from storage
-        response = HttpResponse(invoice.document.read(), content_type='application/octet-stream')
+        # Stream the file from storage in chunks rather than reading it into memory
+        response = FileResponse(invoice.document.open('rb'), content_type='application/octet-stream')
 
         # Get the original filename from the document path
         filename = invoice.document.name.split('/')[-1] if invoice.document.name else f'Invoice_{invoice.invoice_number}.pdf'
@@ -1024,7 +1015,7 @@ def invoice_document_view(request, pk):
             # Default to PDF for unknown types
             content_type = 'application/pdf'
 
-        response = HttpResponse(invoice.document.read(), content_type=content_type)
+        response = FileResponse(invoice.document.open('rb'), content_type=content_type)
         response['Content-Disposition'] = 'inline'  # View inline instead of download
         return response
     except Exception as e:
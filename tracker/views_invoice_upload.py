@@ -7,6 +7,7 @@ import json
 import logging
 from decimal import Decimal
 from datetime import datetime
+from functools import lru_cache
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -17,10 +18,53 @@ from django.db import transaction
 
 from .models import Order, Customer, Vehicle, Invoice, InvoiceLineItem, InvoicePayment, Branch
 from .utils import get_user_branch
+from .utils.pdf_text_extractor import extract_from_upload
 from .services import OrderService, CustomerService, VehicleService
 
 logger = logging.getLogger(__name__)
 
+# Decimal is immutable, so the zero default and parsed form amounts can be shared
+_DEC_ZERO = Decimal('0')
+
+# Header fields echoed back in the extraction preview, in response order; amounts are sent as floats
+_PREVIEW_HEADER_FIELDS = (
+    'invoice_no', 'code_no', 'customer_name', 'phone', 'email', 'address', 'reference', 'date',
+    'subtotal', 'tax', 'total', 'payment_method', 'delivery_terms', 'remarks', 'attended_by',
+    'kind_attention', 'seller_name', 'seller_address', 'seller_phone', 'seller_email',
+    'seller_tax_id', 'seller_vat_reg',
+)
+_PREVIEW_AMOUNT_FIELDS = frozenset(('subtotal', 'tax', 'total'))
+
+
+def _preview_item(item):
+    """Shape one extracted line item for the preview response."""
+    qty = item.get('qty')
+    return {
+        'description': item.get('description', ''),
+        'qty': int(qty) if isinstance(qty, (int, float)) else 1,
+        'unit': item.get('unit'),
+        'code': item.get('code'),
+        'value': float(item.get('value') or 0)
+    }
+
+
+@lru_cache(maxsize=1024)
+def _to_decimal(val):
+    """Parse a posted amount such as '1,250.00' into a Decimal, defaulting to zero.
+
+    Args:
+        val: Raw form value (string or None)
+
+    Returns:
+        Decimal amount, or zero when the value is empty or not a number
+    """
+    if not val:
+        return _DEC_ZERO
+    try:
+        return Decimal(str(val).replace(',', ''))
+    except Exception:
+        return _DEC_ZERO
+
 
 @login_required
 @require_http_methods(["POST"])
@@ -52,19 +96,9 @@ def api_extract_invoice_preview(request):
             'message': 'No file uploaded'
         })
     
+    # Extract text from PDF (large uploads are read from their temp file, not copied into memory)
     try:
-        file_bytes = uploaded.read()
-    except Exception as e:
-        logger.error(f"Failed to read uploaded file: {e}")
-        return JsonResponse({
-            'success': False,
-            'message': 'Failed to read uploaded file'
-        })
-    
-    # Extract text from PDF
-    try:
-        from tracker.utils.pdf_text_extractor import extract_from_bytes as extract_pdf_text
-        extracted = extract_pdf_text(file_bytes, uploaded.name)
+        extracted = extract_from_upload(uploaded)
     except Exception as e:
         logger.error(f"PDF extraction error: {e}")
         return JsonResponse({
@@ -93,39 +127,10 @@ def api_extract_invoice_preview(request):
         'success': True,
         'message': 'Invoice data extracted successfully',
         'header': {
-            'invoice_no': header.get('invoice_no'),
-            'code_no': header.get('code_no'),
-            'customer_name': header.get('customer_name'),
-            'phone': header.get('phone'),
-            'email': header.get('email'),
-            'address': header.get('address'),
-            'reference': header.get('reference'),
-            'date': header.get('date'),
-            'subtotal': float(header.get('subtotal') or 0),
-            'tax': float(header.get('tax') or 0),
-            'total': float(header.get('total') or 0),
-            'payment_method': header.get('payment_method'),
-            'delivery_terms': header.get('delivery_terms'),
-            'remarks': header.get('remarks'),
-            'attended_by': header.get('attended_by'),
-            'kind_attention': header.get('kind_attention'),
-            'seller_name': header.get('seller_name'),
-            'seller_address': header.get('seller_address'),
-            'seller_phone': header.get('seller_phone'),
-            'seller_email': header.get('seller_email'),
-            'seller_tax_id': header.get('seller_tax_id'),
-            'seller_vat_reg': header.get('seller_vat_reg'),
+            field: float(header.get(field) or 0) if field in _PREVIEW_AMOUNT_FIELDS else header.get(field)
+            for field in _PREVIEW_HEADER_FIELDS
         },
-        'items': [
-            {
-                'description': item.get('description', ''),
-                'qty': int(item.get('qty', 1)) if isinstance(item.get('qty'), (int, float)) else 1,
-                'unit': item.get('unit'),
-                'code': item.get('code'),
-                'value': float(item.get('value') or 0)
-            }
-            for item in items
-        ],
+        'items': [_preview_item(item) for item in items],
         'raw_text': extracted.get('raw_text', '')
     })
 
@@ -180,15 +185,18 @@ def api_create_invoice_from_upload(request):
             customer_type = request.POST.get('customer_type', 'personal')
             plate = (request.POST.get('plate') or '').strip().upper() or None
 
-            # Resolve customer using composite identifier (name + plate) when available
+            # Resolve customer using composite identifier (name + plate) when available; the
+            # matched vehicle comes with its customer and is reused below
             customer_obj = None
+            vehicle = None
             if customer_name and plate:
                 try:
-                    customer_obj = CustomerService.find_customer_by_name_and_plate(
+                    vehicle = CustomerService.find_vehicle_by_name_and_plate(
                         branch=user_branch,
                         full_name=customer_name,
                         plate_number=plate,
                     )
+                    customer_obj = vehicle.customer if vehicle else None
                 except Exception as e:
                     logger.warning(f"Composite name+plate lookup failed: {e}")
 
@@ -244,9 +252,8 @@ def api_create_invoice_from_upload(request):
                         'message': 'Failed to create customer'
                     })
 
-            # Get or create vehicle if plate provided
-            vehicle = None
-            if plate:
+            # Get or create vehicle if plate provided and not already matched above
+            if plate and vehicle is None:
                 try:
                     vehicle = VehicleService.create_or_get_vehicle(customer=customer_obj, plate_number=plate)
                 except Exception as e:
@@ -258,7 +265,8 @@ def api_create_invoice_from_upload(request):
             order = None
             if selected_order_id:
                 try:
-                    order = Order.objects.get(id=int(selected_order_id), branch=user_branch)
+                    # Lock the order row until the invoice is linked so concurrent uploads serialise
+                    order = Order.objects.select_for_update().get(id=int(selected_order_id), branch=user_branch)
                 except Exception:
                     pass
             
@@ -281,7 +289,8 @@ def api_create_invoice_from_upload(request):
             else:
                 # Update existing started order
                 order.customer = customer_obj
-                order.vehicle = vehicle or order.vehicle
+                if vehicle:
+                    order.vehicle = vehicle
                 order.save()
             
             # Create or reuse invoice (enforce one invoice per order)
@@ -308,19 +317,22 @@ def api_create_invoice_from_upload(request):
             inv.reference = request.POST.get('invoice_number', '').strip() or f"INV-{timezone.now().strftime('%Y%m%d%H%M%S')}"
 
             # Collect all notes/remarks
+            notes = request.POST.get('notes', '').strip()
+            remarks = request.POST.get('remarks', '').strip()
+            delivery_terms = request.POST.get('delivery_terms', '').strip()
             notes_parts = []
-            if request.POST.get('notes', '').strip():
-                notes_parts.append(request.POST.get('notes', '').strip())
-            if request.POST.get('remarks', '').strip():
-                notes_parts.append(request.POST.get('remarks', '').strip())
-            if request.POST.get('delivery_terms', '').strip():
-                notes_parts.append(f"Delivery: {request.POST.get('delivery_terms', '').strip()}")
+            if notes:
+                notes_parts.append(notes)
+            if remarks:
+                notes_parts.append(remarks)
+            if delivery_terms:
+                notes_parts.append(f"Delivery: {delivery_terms}")
             inv.notes = ' | '.join(notes_parts) if notes_parts else ''
 
             # Set additional fields
             inv.attended_by = request.POST.get('attended_by', '').strip() or None
             inv.kind_attention = request.POST.get('kind_attention', '').strip() or None
-            inv.remarks = request.POST.get('remarks', '').strip() or None
+            inv.remarks = remarks or None
 
             # Seller information (if provided via POST from extraction preview)
             inv.seller_name = (request.POST.get('seller_name') or '').strip() or None
@@ -331,16 +343,9 @@ def api_create_invoice_from_upload(request):
             inv.seller_vat_reg = (request.POST.get('seller_vat_reg') or '').strip() or None
 
             # Parse amounts (support multiple possible field names)
-            def _dec(val):
-                s = str(val or '0')
-                try:
-                    return Decimal(s.replace(',', ''))
-                except Exception:
-                    return Decimal('0')
-
-            subtotal = _dec(request.POST.get('subtotal') or request.POST.get('net_value'))
-            tax_amount = _dec(request.POST.get('tax_amount') or request.POST.get('tax') or request.POST.get('vat'))
-            total_amount = _dec(request.POST.get('total_amount') or request.POST.get('total') or request.POST.get('gross_value'))
+            subtotal = _to_decimal(request.POST.get('subtotal') or request.POST.get('net_value'))
+            tax_amount = _to_decimal(request.POST.get('tax_amount') or request.POST.get('tax') or request.POST.get('vat'))
+            total_amount = _to_decimal(request.POST.get('total_amount') or request.POST.get('total') or request.POST.get('gross_value'))
 
             inv.subtotal = subtotal
             inv.tax_amount = tax_amount
@@ -354,16 +359,10 @@ def api_create_invoice_from_upload(request):
             # Save uploaded document if provided (optional in two-step flow)
             try:
                 uploaded_file = request.FILES.get('file')
-                if uploaded_file:
-                    from django.core.files.base import ContentFile
-                    try:
-                        uploaded_file.seek(0)
-                        bytes_ = uploaded_file.read()
-                    except Exception:
-                        bytes_ = None
-                    if bytes_:
-                        filename = uploaded_file.name or f"invoice_{inv.invoice_number}.pdf"
-                        inv.document.save(filename, ContentFile(bytes_), save=True)
+                if uploaded_file and uploaded_file.size:
+                    # Storage streams the upload in chunks; no need to read it into memory
+                    filename = uploaded_file.name or f"invoice_{inv.invoice_number}.pdf"
+                    inv.document.save(filename, uploaded_file, save=True)
             except Exception:
                 # Non-fatal
                 pass
@@ -386,10 +385,7 @@ def api_create_invoice_from_upload(request):
                     code = item_codes[idx].strip() if idx < len(item_codes) and item_codes[idx] else ''
                     key = code or desc.strip().lower()
                     qty = int(item_qtys[idx] or 1) if idx < len(item_qtys) else 1
-                    try:
-                        price = Decimal(str(item_prices[idx] or '0').replace(',', '')) if idx < len(item_prices) else Decimal('0')
-                    except Exception:
-                        price = Decimal('0')
+                    price = _to_decimal(item_prices[idx]) if idx < len(item_prices) else _DEC_ZERO
                     unit = item_units[idx].strip() if idx < len(item_units) and item_units[idx] else None
                     if key not in bucket:
                         bucket[key] = {
@@ -401,7 +397,7 @@ def api_create_invoice_from_upload(request):
                         }
                     bucket[key]['qty'] += max(1, qty)
                     # Prefer first non-zero price; otherwise keep existing
-                    if (bucket[key]['unit_price'] or Decimal('0')) == Decimal('0') and price:
+                    if (bucket[key]['unit_price'] or _DEC_ZERO) == _DEC_ZERO and price:
                         bucket[key]['unit_price'] = price
                     if not bucket[key]['unit'] and unit:
                         bucket[key]['unit'] = unit
@@ -412,8 +408,8 @@ def api_create_invoice_from_upload(request):
             try:
                 to_create = []
                 for v in bucket.values():
-                    qty = Decimal(str(v['qty'] or 1))
-                    price = Decimal(str(v['unit_price'] or Decimal('0')))
+                    qty = Decimal(v['qty'] or 1)
+                    price = v['unit_price'] or _DEC_ZERO
                     line_total = qty * price
                     to_create.append(InvoiceLineItem(
                         invoice=inv,
@@ -422,27 +418,24 @@ def api_create_invoice_from_upload(request):
                         quantity=qty,
                         unit=v['unit'],
                         unit_price=price,
-                        tax_rate=Decimal('0'),
+                        tax_rate=_DEC_ZERO,
                         line_total=line_total,
-                        tax_amount=Decimal('0'),
+                        tax_amount=_DEC_ZERO,
                     ))
                 if to_create:
-                    InvoiceLineItem.objects.bulk_create(to_create)
+                    InvoiceLineItem.objects.bulk_create(to_create, batch_size=100)
             except Exception as e:
                 logger.warning(f"Failed to bulk create aggregated line items: {e}")
 
-            # IMPORTANT: Preserve extracted Net, VAT, Gross values for uploaded invoices
-            inv.subtotal = subtotal
-            inv.tax_amount = tax_amount
-            inv.total_amount = total_amount or (subtotal + tax_amount)
-            inv.save(update_fields=['subtotal', 'tax_amount', 'total_amount'])
+            # IMPORTANT: The extracted Net, VAT and Gross values saved above are kept as the invoice
+            # totals; bulk_create skips InvoiceLineItem.save(), so nothing recalculates them
 
             # Create payment record if total > 0
             if inv.total_amount > 0:
                 try:
                     payment = InvoicePayment()
                     payment.invoice = inv
-                    payment.amount = Decimal('0')  # Default to unpaid (amount 0)
+                    payment.amount = _DEC_ZERO  # Default to unpaid (amount 0)
 
                     # Map extracted payment method or use form value or default
                     extracted_method = request.POST.get('payment_method', '').strip().lower() or 'on_delivery'